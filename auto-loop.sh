@@ -4,6 +4,8 @@
 # ============================================================
 # Keeps Claude Code running continuously to drive the AI team.
 # Uses fresh sessions with consensus.md as the relay baton.
+# Each prompt also lists the docs/ and projects/ files changed since the last
+# successful cycle, from an incremental content-hash index.
 #
 # Usage:
 #   ./auto-loop.sh              # Run in foreground
@@ -13,14 +15,30 @@
 #   ./stop-loop.sh              # Graceful stop
 #   kill $(cat .auto-loop.pid)  # Force stop
 #
+# Wake:
+#   kill -USR1 $(cat .auto-loop.pid)  # Skip the current wait, run now
+#
 # Config (env vars):
 #   MODEL=opus                # Claude model (default: opus)
+#   MODEL_ROUTINE=$MODEL        # Model for routine "continue the project" cycles
+#   MODEL_DECISION=$MODEL       # Model for strategy / GO-NO-GO / stuck cycles
+#   BUDGET_HOURLY_USD=0         # Rolling 1h spend budget (0 = none)
+#   BUDGET_DAILY_USD=0          # Rolling 24h spend budget (0 = none)
 #   LOOP_INTERVAL=30            # Seconds between cycles (default: 30)
 #   CYCLE_TIMEOUT_SECONDS=1800  # Max seconds per cycle before force-kill
 #   MAX_CONSECUTIVE_ERRORS=5    # Circuit breaker threshold
 #   COOLDOWN_SECONDS=300        # Cooldown after circuit break
-#   LIMIT_WAIT_SECONDS=3600     # Wait on usage limit
-#   MAX_LOGS=200                # Max cycle logs to keep
+#   LIMIT_WAIT_SECONDS=3600     # Max backoff on usage limit without a reset hint
+#   LIMIT_BACKOFF_BASE_SECONDS=60  # First backoff step on usage limit
+#   LOG_ARCHIVE_MAX_BYTES=104857600  # Size cap for compressed cycle logs
+#   LOG_PACK_BYTES=8388608      # Size of each archive pack
+#   MAX_PARALLEL_CYCLES=1       # Concurrent lanes (one per active project)
+#   CONSENSUS_MAX_BYTES=24576   # Size budget enforced on consensus.md
+#   CONSENSUS_KEEP_ENTRIES=10   # History bullets kept live; older ones archived
+#   STREAM_OUTPUT=0             # 1 = stream-json ingestion with live progress
+#   CYCLE_MAX_RSS_MB=0          # Kill a cycle whose process tree exceeds this RSS (0 = no cap)
+#   CYCLE_MAX_CPU_SECONDS=0     # CPU cap for claude and each child process (0 = no cap)
+#   RESOURCE_SAMPLE_SECONDS=5   # How often the watchdog samples the process tree
 # ============================================================
 
 set -euo pipefail
@@ -34,15 +52,52 @@ CONSENSUS_FILE="$PROJECT_DIR/memories/consensus.md"
 PROMPT_FILE="$PROJECT_DIR/PROMPT.md"
 PID_FILE="$PROJECT_DIR/.auto-loop.pid"
 STATE_FILE="$PROJECT_DIR/.auto-loop-state"
+LANES_DIR="$PROJECT_DIR/.auto-loop-lanes"
+CONSENSUS_LOCK="$PROJECT_DIR/.auto-loop-consensus.lock"
+LIMIT_FLAG="$LANES_DIR/.limit"
+LANE_CONSENSUS_GOOD="$LANES_DIR/.consensus.good"
+LIMIT_STREAK_FILE="$PROJECT_DIR/.auto-loop-limit-streak"
+CONSENSUS_SNAPSHOT="$PROJECT_DIR/.auto-loop-consensus.last"
+ARCHIVE_DIR="$PROJECT_DIR/memories/archive"
+ARCHIVE_INDEX="$ARCHIVE_DIR/index.tsv"
+ARCHIVE_LOCK="$PROJECT_DIR/.auto-loop-archive.lock"
+LIVE_DIR="$LOG_DIR/live"
+METRICS_DIR="$LOG_DIR/metrics"
+METRICS_FILE="$METRICS_DIR/cycles.jsonl"
+METRICS_INDEX="$METRICS_DIR/index.tsv"
+LOG_ARCHIVE_DIR="$LOG_DIR/archive"
+LOG_MANIFEST="$LOG_ARCHIVE_DIR/manifest.tsv"
+LOG_ARCHIVE_LOCK="$PROJECT_DIR/.auto-loop-logs.lock"
+NEXT_ACTION_FILE="$PROJECT_DIR/.auto-loop-next-action"
+WORKSPACE_INDEX="$PROJECT_DIR/.auto-loop-workspace.tsv"
+WORKSPACE_LOCK="$PROJECT_DIR/.auto-loop-workspace.lock"
+WORKSPACE_STATE="$PROJECT_DIR/.auto-loop-workspace"
 
 # Loop settings (all overridable via env vars)
 MODEL="${MODEL:-opus}"
+MODEL_ROUTINE="${MODEL_ROUTINE:-$MODEL}"
+MODEL_DECISION="${MODEL_DECISION:-$MODEL}"
+BUDGET_HOURLY_USD="${BUDGET_HOURLY_USD:-0}"
+BUDGET_DAILY_USD="${BUDGET_DAILY_USD:-0}"
 LOOP_INTERVAL="${LOOP_INTERVAL:-30}"
 CYCLE_TIMEOUT_SECONDS="${CYCLE_TIMEOUT_SECONDS:-1800}"
 MAX_CONSECUTIVE_ERRORS="${MAX_CONSECUTIVE_ERRORS:-5}"
 COOLDOWN_SECONDS="${COOLDOWN_SECONDS:-300}"
 LIMIT_WAIT_SECONDS="${LIMIT_WAIT_SECONDS:-3600}"
-MAX_LOGS="${MAX_LOGS:-200}"
+LIMIT_BACKOFF_BASE_SECONDS="${LIMIT_BACKOFF_BASE_SECONDS:-60}"
+LOG_ARCHIVE_MAX_BYTES="${LOG_ARCHIVE_MAX_BYTES:-104857600}"
+LOG_PACK_BYTES="${LOG_PACK_BYTES:-8388608}"
+MAX_PARALLEL_CYCLES="${MAX_PARALLEL_CYCLES:-1}"
+CONSENSUS_MAX_BYTES="${CONSENSUS_MAX_BYTES:-24576}"
+CONSENSUS_KEEP_ENTRIES="${CONSENSUS_KEEP_ENTRIES:-10}"
+CONSENSUS_DELTA_LINES=40
+WORKSPACE_MANIFEST_LINES=60
+STREAM_OUTPUT="${STREAM_OUTPUT:-0}"
+CYCLE_MAX_RSS_MB="${CYCLE_MAX_RSS_MB:-0}"
+CYCLE_MAX_CPU_SECONDS="${CYCLE_MAX_CPU_SECONDS:-0}"
+RESOURCE_SAMPLE_SECONDS="${RESOURCE_SAMPLE_SECONDS:-5}"
+LIMIT_PATTERN='usage limit|rate[ _]limit|too many requests|resource_exhausted|overloaded'
+DECISION_PATTERN='go ?/ ?no-go|no-go|pre-mortem|premortem|pivot|strategy (meeting|session|review)|战略会议|决策会议|换方向|转向'
 
 # Ensure Agent Teams is available
 export CLAUDE_CODE_EXPERIMENTAL_AGENT_TEAMS=1
@@ -73,12 +128,110 @@ log_cycle() {
 
 check_usage_limit() {
     local output="$1"
-    if echo "$output" | grep -qi "usage limit\|rate limit\|too many requests\|resource_exhausted\|overloaded"; then
+    if echo "$output" | grep -qiE "$LIMIT_PATTERN"; then
         return 0
     fi
     return 1
 }
 
+parse_limit_reset() {
+    # Echoes the epoch second at which the usage limit resets, if the CLI said so
+    local output="$1" epoch seconds
+    # e.g. "Claude AI usage limit reached|1760000000"
+    epoch=$(echo "$output" | grep -oE 'limit reached\|[0-9]{10}' | head -1 | cut -d'|' -f2 || true)
+    if [ -z "$epoch" ]; then
+        epoch=$(echo "$output" | grep -oiE '"?resets?_?at"? *[:=] *"?[0-9]{10}' | grep -oE '[0-9]{10}' | head -1 || true)
+    fi
+    if [ -z "$epoch" ]; then
+        seconds=$(echo "$output" | grep -oiE '"?retry[-_]?after"? *[:=] *"?[0-9]+' | grep -oE '[0-9]+$' | head -1 || true)
+        if [ -n "$seconds" ]; then
+            epoch=$(( $(date +%s) + seconds ))
+        fi
+    fi
+    echo "$epoch"
+}
+
+limit_wait_seconds() {
+    # Usage: limit_wait_seconds <reset_epoch|""> <streak>
+    # Waits until the reported reset (plus jitter); otherwise backs off
+    # exponentially from LIMIT_BACKOFF_BASE_SECONDS up to LIMIT_WAIT_SECONDS.
+    local reset_epoch="$1"
+    local streak="$2"
+    local now delay i=1
+    now=$(date +%s)
+
+    if [ -n "$reset_epoch" ]; then
+        delay=$(( reset_epoch - now ))
+        if [ "$delay" -lt 0 ]; then
+            delay=0
+        elif [ "$delay" -gt 86400 ]; then
+            delay=86400
+        fi
+        echo $(( delay + 5 + RANDOM % 30 ))
+        return 0
+    fi
+
+    delay=$LIMIT_BACKOFF_BASE_SECONDS
+    while [ "$i" -lt "$streak" ] && [ "$delay" -lt "$LIMIT_WAIT_SECONDS" ]; do
+        delay=$((delay * 2))
+        i=$((i + 1))
+    done
+    if [ "$delay" -gt "$LIMIT_WAIT_SECONDS" ]; then
+        delay=$LIMIT_WAIT_SECONDS
+    fi
+    echo $(( delay / 2 + RANDOM % (delay / 2 + 1) ))
+}
+
+limit_streak_bump() {
+    local streak
+    streak=$(cat "$LIMIT_STREAK_FILE" 2>/dev/null || echo 0)
+    streak=$((streak + 1))
+    echo "$streak" > "$LIMIT_STREAK_FILE"
+    echo "$streak"
+}
+
+limit_streak_reset() {
+    rm -f "$LIMIT_STREAK_FILE"
+}
+
+file_mtime() {
+    stat -c %Y "$1" 2>/dev/null || stat -f %m "$1" 2>/dev/null || echo 0
+}
+
+wait_for_event() {
+    # Usage: wait_for_event <seconds> [watch_consensus] [run_now]
+    # Sleeps up to <seconds>, waking early on a stop file, SIGUSR1 (unless
+    # run_now=0, as for usage-limit waits), or (watch_consensus=1) an edit to
+    # consensus.md. Sets WAKE_REASON. A pause arrives as a stop file too
+    # (stop-loop.sh --pause-daemon), so the caller's stop check handles it.
+    local seconds="$1"
+    local watch_consensus="${2:-0}"
+    local run_now="${3:-1}"
+    local deadline consensus_mtime
+
+    deadline=$(( $(date +%s) + seconds ))
+    consensus_mtime=$(file_mtime "$CONSENSUS_FILE")
+
+    WAKE_REASON="timeout"
+    while [ "$(date +%s)" -lt "$deadline" ]; do
+        if [ "$run_now" -eq 1 ] && [ "$RUN_NOW" -eq 1 ]; then
+            RUN_NOW=0
+            WAKE_REASON="signal"
+        elif [ -f "$PROJECT_DIR/.auto-loop-stop" ]; then
+            WAKE_REASON="stop"
+        elif [ "$watch_consensus" -eq 1 ] && [ "$(file_mtime "$CONSENSUS_FILE")" != "$consensus_mtime" ]; then
+            WAKE_REASON="consensus"
+        fi
+        if [ "$WAKE_REASON" != "timeout" ]; then
+            log "Woke early ($WAKE_REASON)"
+            return 0
+        fi
+        # Background sleep so traps (SIGUSR1, SIGTERM) fire immediately
+        sleep 1 &
+        wait $! 2>/dev/null || true
+    done
+}
+
 check_stop_requested() {
     if [ -f "$PROJECT_DIR/.auto-loop-stop" ]; then
         rm -f "$PROJECT_DIR/.auto-loop-stop"
@@ -94,41 +247,142 @@ ERROR_COUNT=$error_count
 LAST_RUN=$(date '+%Y-%m-%d %H:%M:%S')
 STATUS=$1
 MODEL=$MODEL
+LANES=$lane_names
 EOF
 }
 
 cleanup() {
+    local tree
     log "=== Auto Loop Shutting Down (PID $$) ==="
+    if [ -n "$lane_pids" ]; then
+        kill $lane_pids 2>/dev/null || true
+    fi
+    # Take down every running cycle's process tree, not just claude itself
+    for tree in "$LIVE_DIR"/*.pgid; do
+        if [ -f "$tree" ]; then
+            reap_cycle_tree $(cat "$tree") > /dev/null
+            rm -f "$tree"
+        fi
+    done
+    # The stream ingester can still write progress after claude is killed
+    rm -f "$LIVE_DIR"/*.status
     rm -f "$PID_FILE"
     save_state "stopped"
     exit 0
 }
 
 rotate_logs() {
-    # Keep only the latest N cycle logs
-    local count
-    count=$(find "$LOG_DIR" -name "cycle-*.log" -type f 2>/dev/null | wc -l | tr -d ' ')
-    if [ "$count" -gt "$MAX_LOGS" ]; then
-        local to_delete=$((count - MAX_LOGS))
-        find "$LOG_DIR" -name "cycle-*.log" -type f | sort | head -n "$to_delete" | xargs rm -f 2>/dev/null || true
-        log "Log rotation: removed $to_delete old cycle logs"
-    fi
-
-    # Rotate main log if over 10MB
-    local log_size
-    log_size=$(stat -f%z "$LOG_DIR/auto-loop.log" 2>/dev/null || echo 0)
+    # Cycle logs are packed by archive_cycle_log; only the main log rotates
+    # here. wc -c reads the size from the inode on both Linux and macOS.
+    local log_size=0
+    if [ -f "$LOG_DIR/auto-loop.log" ]; then
+        log_size=$(wc -c < "$LOG_DIR/auto-loop.log" | tr -d ' ')
+    fi
     if [ "$log_size" -gt 10485760 ]; then
         mv "$LOG_DIR/auto-loop.log" "$LOG_DIR/auto-loop.log.old"
         log "Main log rotated (was ${log_size} bytes)"
     fi
 }
 
+archive_cycle_log() {
+    # Usage: archive_cycle_log <cycle_log> <cycle_num> <status> <summary>
+    # Compresses a closed cycle log and appends it as a gzip member to the
+    # current pack in logs/archive/, recording pack, byte offset and length
+    # in manifest.tsv. O(1) per cycle; retention only runs when a pack fills.
+    local cycle_log="$1"
+    local cycle_num="$2"
+    local status="${3:-OK}"
+    local summary="$4"
+    local gz pack pack_id offset=0 length new_pack=0
+
+    if [ ! -f "$cycle_log" ]; then
+        return 0
+    fi
+    gz=$(mktemp)
+    gzip -c "$cycle_log" > "$gz"
+    length=$(wc -c < "$gz" | tr -d ' ')
+
+    mkdir -p "$LOG_ARCHIVE_DIR"
+    if ! acquire_lock "$LOG_ARCHIVE_LOCK"; then
+        # Leave the raw log in place; it is picked up on the next start
+        rm -f "$gz"
+        return 1
+    fi
+
+    pack=$(tail -n 1 "$LOG_MANIFEST" 2>/dev/null | cut -f4 || true)
+    if [ -n "$pack" ] && [ -f "$LOG_ARCHIVE_DIR/$pack" ]; then
+        offset=$(wc -c < "$LOG_ARCHIVE_DIR/$pack" | tr -d ' ')
+    fi
+    if [ -z "$pack" ] || [ ! -f "$LOG_ARCHIVE_DIR/$pack" ] || [ $((offset + length)) -gt "$LOG_PACK_BYTES" ]; then
+        pack_id=$(echo "$pack" | tr -cd '0-9' | sed 's/^0*//')
+        pack=$(printf 'cycles-%06d.gz' $(( ${pack_id:-0} + 1 )))
+        offset=0
+        new_pack=1
+    fi
+
+    cat "$gz" >> "$LOG_ARCHIVE_DIR/$pack"
+    printf '%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' "$cycle_num" "$(date '+%Y-%m-%d %H:%M:%S')" \
+        "$(basename "$cycle_log")" "$pack" "$offset" "$length" "$status" \
+        "$(printf '%s' "$summary" | tr '\t\n' '  ' | head -c 200)" >> "$LOG_MANIFEST"
+    if [ "$new_pack" -eq 1 ]; then
+        prune_log_archive
+    fi
+    release_lock "$LOG_ARCHIVE_LOCK"
+
+    rm -f "$gz" "$cycle_log"
+}
+
+prune_log_archive() {
+    # Drops the oldest packs (and their manifest rows) until the archive fits
+    # LOG_ARCHIVE_MAX_BYTES. Caller holds LOG_ARCHIVE_LOCK.
+    local total=0 pack size oldest
+
+    for pack in "$LOG_ARCHIVE_DIR"/cycles-*.gz; do
+        if [ -f "$pack" ]; then
+            total=$(( total + $(wc -c < "$pack") ))
+        fi
+    done
+
+    while [ "$total" -gt "$LOG_ARCHIVE_MAX_BYTES" ]; do
+        set -- "$LOG_ARCHIVE_DIR"/cycles-*.gz
+        if [ $# -le 1 ]; then
+            break
+        fi
+        oldest="$1"
+        size=$(wc -c < "$oldest" | tr -d ' ')
+        rm -f "$oldest"
+        total=$((total - size))
+        awk -F'\t' -v pack="$(basename "$oldest")" '$4 != pack' "$LOG_MANIFEST" > "$LOG_MANIFEST.tmp"
+        mv "$LOG_MANIFEST.tmp" "$LOG_MANIFEST"
+        log "Log archive: dropped $(basename "$oldest") (${size} bytes)"
+    done
+}
+
+archive_stray_cycle_logs() {
+    # Raw cycle logs left behind by a crash or an older version of this script
+    local stray cycle_num
+    for stray in "$LOG_DIR"/cycle-*.log; do
+        if [ ! -f "$stray" ]; then
+            continue
+        fi
+        cycle_num=$(basename "$stray" | sed 's/^cycle-0*\([0-9][0-9]*\)-.*/\1/')
+        archive_cycle_log "$stray" "${cycle_num:-0}" "UNKNOWN" "archived at startup" || true
+    done
+}
+
 backup_consensus() {
     if [ -f "$CONSENSUS_FILE" ]; then
         cp "$CONSENSUS_FILE" "$CONSENSUS_FILE.bak"
     fi
 }
 
+snapshot_consensus() {
+    # Remember the consensus a cycle ended with, to diff against next time
+    if [ -f "$CONSENSUS_FILE" ]; then
+        cp "$CONSENSUS_FILE" "$1"
+    fi
+}
+
 restore_consensus() {
     if [ -f "$CONSENSUS_FILE.bak" ]; then
         cp "$CONSENSUS_FILE.bak" "$CONSENSUS_FILE"
@@ -137,182 +391,856 @@ restore_consensus() {
 }
 
 validate_consensus() {
-    if [ ! -s "$CONSENSUS_FILE" ]; then
+    # Usage: validate_consensus [file] [max_bytes]  (max_bytes=0 skips the budget)
+    local file="${1:-$CONSENSUS_FILE}"
+    local max_bytes="${2:-$CONSENSUS_MAX_BYTES}"
+    local size dup
+    CONSENSUS_ERROR=""
+    if [ ! -s "$file" ]; then
+        CONSENSUS_ERROR="empty or missing"
+        return 1
+    fi
+    if ! grep -q "^# Auto Company Consensus" "$file"; then
+        CONSENSUS_ERROR="missing title"
+        return 1
+    fi
+    if ! grep -q "^## Next Action" "$file"; then
+        CONSENSUS_ERROR="missing Next Action"
+        return 1
+    fi
+    if ! grep -q "^## Company State" "$file"; then
+        CONSENSUS_ERROR="missing Company State"
         return 1
     fi
-    if ! grep -q "^# Auto Company Consensus" "$CONSENSUS_FILE"; then
+    if [ -z "$(consensus_section "$file" "Next Action")" ]; then
+        CONSENSUS_ERROR="empty Next Action"
         return 1
     fi
-    if ! grep -q "^## Next Action" "$CONSENSUS_FILE"; then
+    if [ -z "$(consensus_section "$file" "Company State")" ]; then
+        CONSENSUS_ERROR="empty Company State"
         return 1
     fi
-    if ! grep -q "^## Company State" "$CONSENSUS_FILE"; then
+    dup=$(grep '^## ' "$file" | sort | uniq -d | head -n 1 || true)
+    if [ -n "$dup" ]; then
+        CONSENSUS_ERROR="duplicate section '$dup'"
+        return 1
+    fi
+    size=$(wc -c < "$file" | tr -d ' ')
+    if [ "$max_bytes" -gt 0 ] && [ "$size" -gt "$max_bytes" ]; then
+        CONSENSUS_ERROR="over budget: ${size}/${max_bytes} bytes"
         return 1
     fi
     return 0
 }
 
+rollover_consensus() {
+    # Usage: rollover_consensus <file> <cycle_num> [max_bytes]
+    # Moves all but the newest CONSENSUS_KEEP_ENTRIES bullets of the history
+    # sections into memories/archive/ and indexes them in index.tsv. The
+    # rolled copy is validated first and nothing is archived unless it passes,
+    # so a failed (and restored) cycle cannot archive the same entries twice.
+    # Returns 1 with CONSENSUS_ERROR set when the result is invalid.
+    local file="$1"
+    local cycle_num="$2"
+    local max_bytes="${3:-$CONSENSUS_MAX_BYTES}"
+    local rolled archived archive_file start entries summary
+
+    if [ ! -s "$file" ]; then
+        validate_consensus "$file" "$max_bytes"
+        return
+    fi
+    rolled=$(mktemp)
+    archived=$(mktemp)
+
+    awk -v keep="$CONSENSUS_KEEP_ENTRIES" -v arch="$archived" '
+        function rolling(h) { return h ~ /^## (What We Did This Cycle|Key Decisions Made)/ }
+        NR == FNR {
+            if (/^## /) sec = $0
+            else if (rolling(sec) && /^[-*] /) total[sec]++
+            next
+        }
+        FNR == 1 { sec = "" }
+        /^## / { sec = $0; seen = 0; in_entry = 0; drop = 0; print; next }
+        rolling(sec) {
+            if (/^[-*] /) {
+                seen++
+                in_entry = 1
+                drop = (seen <= total[sec] - keep)
+                if (drop && !header[sec]++) print "#" sec > arch
+            } else if (!(in_entry && /^[ \t]+[^ \t]/)) {
+                in_entry = 0
+                drop = 0
+            }
+            if (drop) { print > arch; next }
+        }
+        { print }
+    ' "$file" "$file" > "$rolled"
+
+    if ! validate_consensus "$rolled" "$max_bytes"; then
+        rm -f "$rolled" "$archived"
+        return 1
+    fi
+    if [ ! -s "$archived" ]; then
+        rm -f "$rolled" "$archived"
+        return 0
+    fi
+
+    mkdir -p "$ARCHIVE_DIR"
+    if ! acquire_lock "$ARCHIVE_LOCK"; then
+        log "Consensus rollover skipped (archive lock busy)"
+        rm -f "$rolled" "$archived"
+        validate_consensus "$file" "$max_bytes"
+        return
+    fi
+    archive_file="$ARCHIVE_DIR/consensus-$(date '+%Y-%m').md"
+    start=1
+    if [ -f "$archive_file" ]; then
+        start=$(( $(wc -l < "$archive_file") + 2 ))
+    fi
+    {
+        [ "$start" -gt 1 ] && echo ""
+        echo "## Cycle #$cycle_num — $(date '+%Y-%m-%d %H:%M:%S')"
+        echo ""
+        cat "$archived"
+    } >> "$archive_file"
+    entries=$(grep -c '^[-*] ' "$archived" || true)
+    summary=$(grep -m1 '^[-*] ' "$archived" | cut -c3- | tr '\t' ' ' | head -c 120 || true)
+    printf '%s\t%s\t%s\t%s\t%s\t%s\n' "$cycle_num" "$(date '+%Y-%m-%d %H:%M:%S')" \
+        "$(basename "$archive_file")" "$start" "$entries" "$summary" >> "$ARCHIVE_INDEX"
+    release_lock "$ARCHIVE_LOCK"
+
+    mv "$rolled" "$file"
+    rm -f "$archived"
+}
+
+cycle_tree_sample() {
+    # Usage: cycle_tree_sample <root_pid> <group>
+    # One ps pass over the cycle's process tree: the root, its process group
+    # when group=1, and descendants that left the group (detached spawns).
+    # Prints "pid rss_kb read_bytes write_bytes cpu_seconds" per process; I/O
+    # counters come from /proc and read as 0 where it does not exist. ps time
+    # is [dd-]hh:mm:ss on Linux and m:ss.ss on macOS.
+    ps -A -o pid= -o ppid= -o pgid= -o rss= -o time= 2>/dev/null | awk -v root="$1" -v group="$2" '
+        function secs(t,   d, part, n, i, total) {
+            d = 0
+            if (index(t, "-")) { d = substr(t, 1, index(t, "-") - 1); t = substr(t, index(t, "-") + 1) }
+            n = split(t, part, ":")
+            for (i = 1; i <= n; i++) total = total * 60 + part[i]
+            return d * 86400 + total
+        }
+        { ppid[$1] = $2; rss[$1] = $4; cpu[$1] = secs($5); if ($1 == root || (group && $3 == root)) member[$1] = 1 }
+        END {
+            do {
+                grew = 0
+                for (p in ppid) if (!(p in member) && (ppid[p] in member)) { member[p] = 1; grew = 1 }
+            } while (grew)
+            for (p in member) {
+                rb = 0; wb = 0
+                io = "/proc/" p "/io"
+                while ((getline line < io) > 0) {
+                    if (line ~ /^read_bytes:/) rb = substr(line, 13) + 0
+                    if (line ~ /^write_bytes:/) wb = substr(line, 14) + 0
+                }
+                close(io)
+                print p, rss[p], rb, wb, cpu[p]
+            }
+        }'
+}
+
+cycle_tree_pids() {
+    # Usage: cycle_tree_pids <root_pid|""> <group> <marker>
+    # Live processes of a cycle: its tree (see cycle_tree_sample) plus anything
+    # carrying its AUTO_LOOP_CYCLE marker, which survives setsid and
+    # reparenting. With an empty root only the marker is trusted.
+    {
+        if [ -n "$1" ]; then
+            cycle_tree_sample "$1" "$2" | awk '{ print $1 }'
+        fi
+        ps axeww -o pid= -o command= 2>/dev/null | awk -v m="AUTO_LOOP_CYCLE=$3" '
+            index($0 " ", " " m " ") { print $1 }'
+    } | sort -u | grep -v -x -e "$$" -e "${BASHPID:-$$}" || true
+}
+
+reap_cycle_tree() {
+    # Usage: reap_cycle_tree <root_pid|""> <group> <marker>
+    # TERM, then KILL after a short grace, for every process of a cycle.
+    # Prints how many processes were still alive.
+    local root="$1"
+    local group="$2"
+    local marker="$3"
+    local pids count waited=0
+
+    pids=$(cycle_tree_pids "$root" "$group" "$marker")
+    if [ -z "$pids" ]; then
+        echo 0
+        return 0
+    fi
+    count=$(echo "$pids" | wc -l | tr -d ' ')
+    if [ "$group" -eq 1 ]; then
+        kill -TERM -- "-$root" 2>/dev/null || true
+    fi
+    kill -TERM $pids 2>/dev/null || true
+    while [ "$waited" -lt 5 ] && [ -n "$(cycle_tree_pids "$root" "$group" "$marker")" ]; do
+        sleep 1
+        waited=$((waited + 1))
+    done
+    pids=$(cycle_tree_pids "$root" "$group" "$marker")
+    if [ -n "$pids" ]; then
+        if [ "$group" -eq 1 ]; then
+            kill -KILL -- "-$root" 2>/dev/null || true
+        fi
+        kill -KILL $pids 2>/dev/null || true
+    fi
+    echo "$count"
+}
+
 run_claude_cycle() {
+    # Usage: run_claude_cycle <prompt> <workdir> <cycle_log>
+    # Runs one claude -p cycle in its own process group under the watchdog,
+    # writing its output straight to <cycle_log>. Sets EXIT_CODE,
+    # CYCLE_TIMED_OUT, CYCLE_ABORTED, CYCLE_MEMCAP, CYCLE_LIMIT_LINE, the
+    # resource usage fields (CYCLE_CPU_USER/SYS, CYCLE_PEAK_RSS_KB,
+    # CYCLE_PROCS, CYCLE_IO_READ/WRITE, CYCLE_REAPED) and the fields from
+    # extract_cycle_metadata.
     local prompt="$1"
-    local output_file timeout_flag
+    local workdir="$2"
+    local cycle_log="$3"
+    local scratch format="json" verbose_flag="" out progress tree_file marker group
+    local claude_pid watchdog_pid ingest_pid="" waited
 
-    output_file=$(mktemp)
-    timeout_flag=$(mktemp)
+    scratch=$(mktemp -d)
+    CYCLE_STARTED=$(date +%s)
+    PROMPT_BYTES=$(printf '%s' "$prompt" | wc -c | tr -d ' ')
+    out="$cycle_log"
+    progress="$LIVE_DIR/$(basename "$cycle_log" .log).status"
+    tree_file="$LIVE_DIR/$(basename "$cycle_log" .log).pgid"
+    marker="$$-$(basename "$cycle_log" .log)"
+    if [ "$STREAM_OUTPUT" -eq 1 ]; then
+        format="stream-json"
+        verbose_flag="--verbose"
+        out="$scratch/stream"
+        mkfifo "$out"
+    fi
 
     set +e
+    times > "$scratch/cpu.before"
+    # Job control gives the cycle its own process group, so the watchdog and
+    # cleanup can signal everything it spawns at once
+    set -m
     (
-        cd "$PROJECT_DIR" && claude -p "$prompt" \
-            --model "$MODEL" \
+        cd "$workdir" || exit 1
+        if [ "$CYCLE_MAX_CPU_SECONDS" -gt 0 ]; then
+            ulimit -t "$CYCLE_MAX_CPU_SECONDS"
+        fi
+        AUTO_LOOP_CYCLE="$marker" exec claude -p "$prompt" \
+            --model "${CYCLE_MODEL:-$MODEL}" \
             --dangerously-skip-permissions \
-            --output-format json
-    ) > "$output_file" 2>&1 &
-    local claude_pid=$!
+            --output-format "$format" $verbose_flag < /dev/null
+    ) > "$out" 2>&1 &
+    claude_pid=$!
+    set +m
+    # Only signal the group if claude really leads its own (never the loop's)
+    group=0
+    if [ "$(ps -o pgid= -p "$claude_pid" 2>/dev/null | tr -d ' ')" = "$claude_pid" ]; then
+        group=1
+    fi
+    printf '%s %s %s\n' "$claude_pid" "$group" "$marker" > "$tree_file"
 
+    if [ "$STREAM_OUTPUT" -eq 1 ]; then
+        ingest_stream "$scratch" "$claude_pid" "$progress" < "$out" > "$cycle_log" &
+        ingest_pid=$!
+    fi
+
+    # Watchdog: samples the process tree, enforces the wall-time and memory
+    # caps, and reaps the whole tree when either is hit
     (
-        sleep "$CYCLE_TIMEOUT_SECONDS"
-        if kill -0 "$claude_pid" 2>/dev/null; then
-            echo "1" > "$timeout_flag"
-            kill -TERM "$claude_pid" 2>/dev/null || true
-            sleep 5
-            kill -KILL "$claude_pid" 2>/dev/null || true
-        fi
+        deadline=$(( $(date +%s) + CYCLE_TIMEOUT_SECONDS ))
+        nap=""
+        trap 'kill $nap 2>/dev/null; exit 0' TERM
+        samples=0
+        while kill -0 "$claude_pid" 2>/dev/null; do
+            samples=$((samples + 1))
+            sample=$(cycle_tree_sample "$claude_pid" "$group")
+            printf '%s\n' "$sample" | sed "s/^/$samples /" >> "$scratch/samples"
+            if [ "$CYCLE_MAX_RSS_MB" -gt 0 ] && [ "$(printf '%s\n' "$sample" | awk '{ kb += $2 } END { print kb + 0 }')" -gt $((CYCLE_MAX_RSS_MB * 1024)) ]; then
+                echo "1" > "$scratch/memcap"
+                reap_cycle_tree "$claude_pid" "$group" "$marker" > /dev/null
+                exit 0
+            fi
+            left=$(( deadline - $(date +%s) ))
+            if [ "$left" -le 0 ]; then
+                echo "1" > "$scratch/timeout"
+                reap_cycle_tree "$claude_pid" "$group" "$marker" > /dev/null
+                exit 0
+            fi
+            if [ "$left" -gt "$RESOURCE_SAMPLE_SECONDS" ]; then
+                left="$RESOURCE_SAMPLE_SECONDS"
+            fi
+            sleep "$left" &
+            nap=$!
+            wait "$nap"
+        done
     ) &
-    local watchdog_pid=$!
+    watchdog_pid=$!
 
     wait "$claude_pid"
     EXIT_CODE=$?
+    # A trapped signal (e.g. SIGUSR1) interrupts wait; keep waiting for claude
+    while kill -0 "$claude_pid" 2>/dev/null; do
+        wait "$claude_pid"
+        EXIT_CODE=$?
+    done
+    times > "$scratch/cpu.after"
 
     kill "$watchdog_pid" 2>/dev/null || true
     wait "$watchdog_pid" 2>/dev/null || true
-    set -e
 
-    OUTPUT=$(cat "$output_file")
-    rm -f "$output_file"
+    # Last look at leftovers before they are killed, for their CPU and I/O
+    cycle_tree_sample "$claude_pid" "$group" | sed "s/^/final /" >> "$scratch/samples"
+
+    # Anything the cycle left running (dev servers, builds) dies with it
+    CYCLE_REAPED=$(reap_cycle_tree "$claude_pid" "$group" "$marker")
+    rm -f "$tree_file"
+    if [ "$CYCLE_REAPED" -gt 0 ]; then
+        log "Reaped $CYCLE_REAPED processes left running by $(basename "$cycle_log" .log)"
+    fi
+
+    if [ -n "$ingest_pid" ]; then
+        # Agent subprocesses can hold the pipe open after claude exits
+        waited=0
+        while kill -0 "$ingest_pid" 2>/dev/null && [ "$waited" -lt 5 ]; do
+            sleep 1
+            waited=$((waited + 1))
+        done
+        kill "$ingest_pid" 2>/dev/null || true
+        wait "$ingest_pid" 2>/dev/null || true
+        rm -f "$progress"
+    fi
+    set -e
 
-    if [ -s "$timeout_flag" ]; then
+    CYCLE_ENDED=$(date +%s)
+    if [ -s "$scratch/timeout" ]; then
         CYCLE_TIMED_OUT=1
         EXIT_CODE=124
     else
         CYCLE_TIMED_OUT=0
     fi
-    rm -f "$timeout_flag"
+    CYCLE_MEMCAP=0
+    if [ -s "$scratch/memcap" ]; then
+        CYCLE_MEMCAP=1
+    fi
+    read_cycle_usage "$scratch"
+
+    if [ "$STREAM_OUTPUT" -eq 1 ]; then
+        CYCLE_ABORTED=0
+        if [ -f "$scratch/aborted" ]; then
+            CYCLE_ABORTED=1
+        fi
+        CYCLE_LIMIT_LINE=$(head -c 4000 "$scratch/limit" 2>/dev/null || true)
+        extract_cycle_metadata "$scratch/result"
+    else
+        CYCLE_ABORTED=0
+        CYCLE_LIMIT_LINE=$(grep -iE -m1 "$LIMIT_PATTERN" "$cycle_log" | head -c 4000 || true)
+        extract_cycle_metadata "$cycle_log"
+    fi
+    rm -rf "$scratch"
+}
+
+read_cycle_usage() {
+    # Usage: read_cycle_usage <scratch_dir>
+    # CPU: the shell's times only count children waited for up the whole
+    # chain, so processes the reaper killed or init adopted are missing from
+    # it. The per-process CPU seen in the samples covers those (up to one
+    # sample interval stale); the larger total wins and any excess is added
+    # to user time. RSS, process count and I/O come from the samples alone.
+    local cpu sampled_cpu
+    read -r CYCLE_PEAK_RSS_KB CYCLE_PROCS CYCLE_IO_READ CYCLE_IO_WRITE sampled_cpu <<< "$(awk '
+        { kb[$1] += $3; if ($4 > rb[$2]) rb[$2] = $4; if ($5 > wb[$2]) wb[$2] = $5; if ($6 > cpu[$2]) cpu[$2] = $6 }
+        END {
+            for (t in kb) if (kb[t] > peak) peak = kb[t]
+            for (p in rb) { procs++; r += rb[p]; w += wb[p]; c += cpu[p] }
+            printf "%d %d %d %d %.2f\n", peak, procs, r, w, c
+        }' "$1/samples" 2>/dev/null || echo "0 0 0 0 0")"
+    cpu=$(cat "$1/cpu.before" "$1/cpu.after" 2>/dev/null | awk -v sampled="${sampled_cpu:-0}" '
+        function secs(v,   t) { split(v, t, /[ms]/); return t[1] * 60 + t[2] }
+        NR == 2 { u = secs($1); s = secs($2) }
+        NR == 4 {
+            u = secs($1) - u; s = secs($2) - s
+            if (sampled > u + s) u = sampled - s
+            printf "%.2f %.2f\n", u, s
+        }')
+    CYCLE_CPU_USER="${cpu% *}"
+    CYCLE_CPU_SYS="${cpu#* }"
+}
+
+ingest_stream() {
+    # Usage: ingest_stream <scratch_dir> <claude_pid> <progress_file>
+    # One pass over stream-json events on stdin: copies each event to stdout
+    # (the cycle log), keeps the final result event, publishes live progress
+    # for monitor.sh --live, and kills claude as soon as a non-tool error
+    # event reports a usage or rate limit.
+    local line_flag=""
+    # mawk block-buffers piped input unless asked to read line by line
+    case "$(awk -W version 2>&1)" in
+        *mawk*) line_flag="-W interactive" ;;
+    esac
+    exec awk $line_flag -v dir="$1" -v pid="$2" -v progress="$3" -v started="$(date +%s)" -v pattern="$LIMIT_PATTERN" '
+        { print; fflush(); events++ }
+        /^[{]"type":"result"/ {
+            print > (dir "/result"); close(dir "/result")
+            last = "result"
+        }
+        /^[{]"type":"assistant"/ {
+            last = "assistant"
+            if (match($0, /"type":"tool_use"[^}]*"name":"[^"]*"/)) {
+                last = substr($0, RSTART, RLENGTH)
+                sub(/.*"name":"/, "tool ", last)
+                sub(/"$/, "", last)
+            }
+        }
+        !/^[{]"type":"user"/ && /"type":"error"|"is_error":true|limit reached[|]/ {
+            if (!limited && tolower($0) ~ pattern) {
+                limited = 1
+                print > (dir "/limit"); close(dir "/limit")
+                if ($0 !~ /^[{]"type":"result"/) {
+                    print "1" > (dir "/aborted"); close(dir "/aborted")
+                    system("kill -TERM " pid " 2>/dev/null")
+                    last = "aborted on usage limit"
+                }
+            }
+        }
+        {
+            printf "%s\t%d\t%s\n", started, events, last > progress
+            close(progress)
+        }
+    '
 }
 
 extract_cycle_metadata() {
+    # Usage: extract_cycle_metadata <file>  — single jq pass over the result JSON
+    local file="$1"
     RESULT_TEXT=""
     CYCLE_COST=""
     CYCLE_SUBTYPE=""
     CYCLE_TYPE=""
 
+    if [ ! -f "$file" ]; then
+        return 0
+    fi
+
     if command -v jq &>/dev/null; then
-        RESULT_TEXT=$(echo "$OUTPUT" | jq -r '.result // empty' 2>/dev/null | head -c 2000 || true)
-        CYCLE_COST=$(echo "$OUTPUT" | jq -r '.total_cost_usd // empty' 2>/dev/null || true)
-        CYCLE_SUBTYPE=$(echo "$OUTPUT" | jq -r '.subtype // empty' 2>/dev/null || true)
-        CYCLE_TYPE=$(echo "$OUTPUT" | jq -r '.type // empty' 2>/dev/null || true)
+        # One value per line; the (possibly multi-line or empty) result comes
+        # last and takes the rest, so a missing field cannot shift the others
+        {
+            read -r CYCLE_COST || true
+            read -r CYCLE_SUBTYPE || true
+            read -r CYCLE_TYPE || true
+            RESULT_TEXT=$(cat)
+        } < <(jq -r '(.total_cost_usd // ""), (.subtype // ""), (.type // ""), (.result // "" | tostring | .[0:2000])' \
+            "$file" 2>/dev/null || true)
     else
-        RESULT_TEXT=$(echo "$OUTPUT" | head -c 2000 || true)
-        CYCLE_COST=$(echo "$OUTPUT" | sed -n 's/.*"total_cost_usd":\([0-9.]*\).*/\1/p' | head -1 || true)
-        CYCLE_SUBTYPE=$(echo "$OUTPUT" | sed -n 's/.*"subtype":"\([^"]*\)".*/\1/p' | head -1 || true)
-        CYCLE_TYPE=$(echo "$OUTPUT" | sed -n 's/.*"type":"\([^"]*\)".*/\1/p' | head -1 || true)
+        RESULT_TEXT=$(head -c 2000 "$file" || true)
+        CYCLE_COST=$(sed -n 's/.*"total_cost_usd":\([0-9.]*\).*/\1/p' "$file" | head -1 || true)
+        CYCLE_SUBTYPE=$(sed -n 's/.*"subtype":"\([^"]*\)".*/\1/p' "$file" | head -1 || true)
+        CYCLE_TYPE=$(sed -n 's/.*"type":"\([^"]*\)".*/\1/p' "$file" | head -1 || true)
     fi
 }
 
-# === Setup ===
+json_escape() {
+    printf '%s' "$1" | tr '\n\t' '  ' | sed 's/\\/\\\\/g; s/"/\\"/g'
+}
+
+metrics_append() {
+    # Usage: metrics_append <json_line>
+    # Append-only store; index.tsv maps each UTC day to its first byte offset
+    # so windowed queries in monitor.sh --stats skip older records.
+    local line="$1"
+    local now day last_day size=0
+    now=$(date +%s)
+    day=$(( now - now % 86400 ))
+    last_day=$(tail -n 1 "$METRICS_INDEX" 2>/dev/null | cut -f1 || true)
+    if [ "$last_day" != "$day" ]; then
+        if [ -f "$METRICS_FILE" ]; then
+            size=$(wc -c < "$METRICS_FILE" | tr -d ' ')
+        fi
+        printf '%s\t%s\n' "$day" "$size" >> "$METRICS_INDEX"
+    fi
+    printf '%s\n' "$line" >> "$METRICS_FILE"
+}
 
-mkdir -p "$LOG_DIR" "$PROJECT_DIR/memories"
+record_cycle_metrics() {
+    # Usage: record_cycle_metrics <cycle_num> [lane]
+    local cycle_num="$1"
+    local lane="${2:-}"
+    local timed_out=false
+    if [ "$CYCLE_TIMED_OUT" -eq 1 ]; then
+        timed_out=true
+    fi
+    metrics_append "$(printf '{"kind":"cycle","cycle":%s,"lane":"%s","started_at":"%s","start":%s,"end":%s,"duration":%s,"cost":%s,"subtype":"%s","exit_code":%s,"timed_out":%s,"failure":"%s","prompt_bytes":%s,"model":"%s","tier":"%s","cpu_user":%s,"cpu_sys":%s,"peak_rss_kb":%s,"procs":%s,"io_read":%s,"io_write":%s,"reaped":%s}' \
+        "$cycle_num" "$lane" "$(date -r "$CYCLE_STARTED" '+%Y-%m-%dT%H:%M:%S' 2>/dev/null || date -d "@$CYCLE_STARTED" '+%Y-%m-%dT%H:%M:%S')" \
+        "$CYCLE_STARTED" "$CYCLE_ENDED" "$((CYCLE_ENDED - CYCLE_STARTED))" "${CYCLE_COST:-null}" \
+        "$(json_escape "$CYCLE_SUBTYPE")" "$EXIT_CODE" "$timed_out" "$(json_escape "$cycle_failed_reason")" \
+        "${PROMPT_BYTES:-0}" "${CYCLE_MODEL:-$MODEL}" "${CYCLE_KIND:-routine}" \
+        "${CYCLE_CPU_USER:-0}" "${CYCLE_CPU_SYS:-0}" "${CYCLE_PEAK_RSS_KB:-0}" "${CYCLE_PROCS:-0}" \
+        "${CYCLE_IO_READ:-0}" "${CYCLE_IO_WRITE:-0}" "${CYCLE_REAPED:-0}")"
+}
 
-# Clean up stale stop file from previous run
-rm -f "$PROJECT_DIR/.auto-loop-stop"
+record_wait_metrics() {
+    # Usage: record_wait_metrics <reason> <start_epoch> <end_epoch> [cycle_num] [lane]
+    metrics_append "$(printf '{"kind":"wait","reason":"%s","cycle":%s,"lane":"%s","start":%s,"end":%s,"duration":%s}' \
+        "$1" "${4:-0}" "${5:-}" "$2" "$3" "$(($3 - $2))")"
+}
 
-# Check for existing instance
-if [ -f "$PID_FILE" ]; then
-    existing_pid=$(cat "$PID_FILE")
-    if kill -0 "$existing_pid" 2>/dev/null; then
-        echo "Auto loop already running (PID $existing_pid). Stop it first with ./stop-loop.sh"
-        exit 1
+consensus_section() {
+    # Usage: consensus_section <file> <heading>  — body of "## <heading>"
+    awk -v h="## $2" '/^## / { s = ($0 == h); next } s && NF' "$1" 2>/dev/null || true
+}
+
+select_cycle_model() {
+    # Usage: select_cycle_model <cycle_num> <consensus_file> [lane]
+    # Tiering per the PROMPT.md convergence rules: strategy cycles (Day 0 /
+    # Exploring, GO / NO-GO, a Next Action repeated twice) get MODEL_DECISION,
+    # everything else MODEL_ROUTINE. Sets CYCLE_KIND, CYCLE_MODEL and
+    # CYCLE_NEXT_ACTION (stored by remember_next_action after a success, so
+    # a retry of a failed cycle does not count as a repeat).
+    local cycle_num="$1"
+    local file="$2"
+    local lane="${3:-}"
+    local phase next_action
+
+    phase=$(consensus_section "$file" "Current Phase")
+    next_action=$(consensus_section "$file" "Next Action")
+
+    CYCLE_KIND="routine"
+    if [ -z "$phase" ] && [ -z "$lane" ] && [ "$cycle_num" -le 2 ]; then
+        CYCLE_KIND="decision"
+    elif printf '%s' "$phase" | grep -qiE 'day 0|exploring'; then
+        CYCLE_KIND="decision"
+    elif printf '%s' "$next_action" | grep -qiE "$DECISION_PATTERN"; then
+        CYCLE_KIND="decision"
+    elif [ -z "$lane" ] && [ -n "$next_action" ] && [ "$next_action" = "$(cat "$NEXT_ACTION_FILE" 2>/dev/null)" ]; then
+        CYCLE_KIND="decision"
     fi
-fi
+    CYCLE_NEXT_ACTION="$next_action"
 
-# Check dependencies
-if ! command -v claude &>/dev/null; then
-    echo "Error: 'claude' CLI not found in PATH. Install Claude Code first."
-    exit 1
-fi
+    if [ "$CYCLE_KIND" = "decision" ]; then
+        CYCLE_MODEL="$MODEL_DECISION"
+    else
+        CYCLE_MODEL="$MODEL_ROUTINE"
+    fi
+}
 
-if [ ! -f "$PROMPT_FILE" ]; then
-    echo "Error: PROMPT.md not found at $PROMPT_FILE"
-    exit 1
-fi
+remember_next_action() {
+    # After a successful serial cycle: the Next Action it started from
+    printf '%s' "$CYCLE_NEXT_ACTION" > "$NEXT_ACTION_FILE"
+}
 
-# Write PID file
-echo $$ > "$PID_FILE"
+budget_check() {
+    # Rolling spend governor over the metrics store. Sets BUDGET_WAIT (seconds
+    # until the next cycle may start) and BUDGET_SPEND (summary for the log).
+    # Returns 1 when no budget is configured.
+    local now since offset
+    BUDGET_WAIT=0
+    BUDGET_SPEND=""
+    if ! awk -v h="$BUDGET_HOURLY_USD" -v d="$BUDGET_DAILY_USD" 'BEGIN { exit !(h > 0 || d > 0) }'; then
+        return 1
+    fi
+    if [ ! -s "$METRICS_FILE" ]; then
+        return 0
+    fi
 
-# Trap signals for graceful shutdown
-trap cleanup SIGTERM SIGINT SIGHUP
+    now=$(date +%s)
+    since=$((now - 86400))
+    offset=$(awk -F'\t' -v since="$since" '$1 <= since - since % 86400 { o = $2 } END { print o + 0 }' "$METRICS_INDEX" 2>/dev/null || echo 0)
+    read -r BUDGET_WAIT BUDGET_SPEND <<< "$(tail -c +"$((offset + 1))" "$METRICS_FILE" | awk \
+        -v now="$now" -v hourly="$BUDGET_HOURLY_USD" -v daily="$BUDGET_DAILY_USD" '
+        function num(k) {
+            if (match($0, "\"" k "\":[-0-9.]+")) return substr($0, RSTART + length(k) + 3, RLENGTH - length(k) - 3) + 0
+            return 0
+        }
+        function hold(window, budget,   i, spend, cycles, first, wait) {
+            for (i = 1; i <= n; i++) {
+                if (end[i] > now - window) {
+                    spend += cost[i]
+                    cycles++
+                    if (!first) first = i
+                }
+            }
+            spent[window] = spend
+            if (budget <= 0 || cycles == 0) return 0
+            # Pace cycle starts so the average cycle cost fits the budget rate
+            wait = last_start + window * (spend / cycles) / budget - now
+            # Over budget: wait until enough spend ages out of the window
+            for (i = first; i <= n && spend >= budget; i++) {
+                spend -= cost[i]
+                if (end[i] + window - now > wait) wait = end[i] + window - now
+            }
+            return wait
+        }
+        /"kind":"cycle"/ && num("end") > now - 86400 {
+            n++
+            end[n] = num("end")
+            cost[n] = num("cost")
+            if (num("start") > last_start) last_start = num("start")
+        }
+        END {
+            wait = hold(3600, hourly)
+            daily_wait = hold(86400, daily)
+            if (daily_wait > wait) wait = daily_wait
+            summary = sprintf("$%.2f in 1h", spent[3600]) (hourly > 0 ? " (budget $" hourly ")" : "")
+            summary = summary sprintf(", $%.2f in 24h", spent[86400]) (daily > 0 ? " (budget $" daily ")" : "")
+            printf "%d %s\n", (wait > 0 ? wait : 0), summary
+        }')"
+}
 
-# Initialize counters
-loop_count=0
-error_count=0
+wait_between_cycles() {
+    # LOOP_INTERVAL wait, stretched by the budget governor when spend runs ahead
+    local wait_started
+    if budget_check && [ "$BUDGET_WAIT" -gt "$LOOP_INTERVAL" ]; then
+        log_cycle $loop_count "BUDGET" "Spent $BUDGET_SPEND. Stretching wait to ${BUDGET_WAIT}s..."
+        save_state "waiting_budget"
+        wait_started=$(date +%s)
+        wait_for_event "$BUDGET_WAIT"
+        record_wait_metrics "budget" "$wait_started" "$(date +%s)" "$loop_count"
+    else
+        save_state "idle"
+        log_cycle $loop_count "WAIT" "Sleeping ${LOOP_INTERVAL}s before next cycle..."
+        wait_for_event "$LOOP_INTERVAL" 1
+    fi
+}
 
-log "=== Auto Company Loop Started (PID $$) ==="
-log "Project: $PROJECT_DIR"
-log "Model: $MODEL | Interval: ${LOOP_INTERVAL}s | Timeout: ${CYCLE_TIMEOUT_SECONDS}s | Breaker: ${MAX_CONSECUTIVE_ERRORS} errors"
+classify_cycle() {
+    # Usage: classify_cycle <cycle_num> [consensus_file]
+    # The live consensus is rolled over and held to its size budget; lane
+    # copies are only checked for structure until they are merged back.
+    local cycle_num="$1"
+    local consensus_file="${2:-$CONSENSUS_FILE}"
+    cycle_failed_reason=""
+    if [ "$CYCLE_TIMED_OUT" -eq 1 ]; then
+        cycle_failed_reason="Timed out after ${CYCLE_TIMEOUT_SECONDS}s"
+    elif [ "$CYCLE_MEMCAP" -eq 1 ]; then
+        cycle_failed_reason="Killed over memory cap (${CYCLE_MAX_RSS_MB}MB)"
+    elif [ "$CYCLE_MAX_CPU_SECONDS" -gt 0 ] && [ "$EXIT_CODE" -eq 152 ]; then
+        cycle_failed_reason="Killed over CPU cap (${CYCLE_MAX_CPU_SECONDS}s, SIGXCPU)"
+    elif [ "$CYCLE_ABORTED" -eq 1 ]; then
+        cycle_failed_reason="Aborted mid-stream on usage limit"
+    elif [ $EXIT_CODE -ne 0 ]; then
+        cycle_failed_reason="Exit code $EXIT_CODE"
+    elif [ "$CYCLE_SUBTYPE" != "success" ]; then
+        cycle_failed_reason="Non-success subtype '${CYCLE_SUBTYPE:-unknown}'"
+    elif [ "$consensus_file" = "$CONSENSUS_FILE" ]; then
+        if ! rollover_consensus "$consensus_file" "$cycle_num" "$CONSENSUS_MAX_BYTES"; then
+            cycle_failed_reason="consensus.md validation failed after cycle ($CONSENSUS_ERROR)"
+        fi
+    elif ! validate_consensus "$consensus_file" 0; then
+        cycle_failed_reason="consensus.md validation failed after cycle ($CONSENSUS_ERROR)"
+    fi
+}
 
-# === Main Loop ===
+workspace_index_update() {
+    # Refreshes WORKSPACE_INDEX (path, size, mtime, hash) for docs/ and
+    # projects/. Only files whose size or mtime changed since the previous
+    # pass are hashed again, so the cost tracks what changed. Caller holds
+    # WORKSPACE_LOCK.
+    local listing changed hashes stat_flag stat_fmt hash_cmd tab
 
-while true; do
-    # Check for stop request
-    if check_stop_requested; then
-        log "Stop requested. Shutting down gracefully."
-        cleanup
+    tab=$(printf '\t')
+    if stat -c '%Y' "$PROMPT_FILE" > /dev/null 2>&1; then
+        stat_flag="-c"
+        stat_fmt="%n$tab%s$tab%Y"
+    else
+        stat_flag="-f"
+        stat_fmt="%N$tab%z$tab%m"
+    fi
+    if command -v sha1sum > /dev/null; then
+        hash_cmd="sha1sum"
+    elif command -v shasum > /dev/null; then
+        hash_cmd="shasum"
+    else
+        hash_cmd="cksum"
     fi
 
-    loop_count=$((loop_count + 1))
-    cycle_log="$LOG_DIR/cycle-$(printf '%04d' $loop_count)-$(date '+%Y%m%d-%H%M%S').log"
+    listing=$(mktemp)
+    changed=$(mktemp)
+    hashes=$(mktemp)
+    (
+        cd "$PROJECT_DIR" && find docs projects \
+            \( -name node_modules -o -name .git -o -name .next -o -name dist -o -name build \
+               -o -name target -o -name .venv -o -name venv -o -name __pycache__ -o -name .cache \) -prune \
+            -o -type f ! -name .gitkeep ! -name .DS_Store -print 2>/dev/null \
+            | tr '\n' '\0' | xargs -0 stat "$stat_flag" "$stat_fmt" 2>/dev/null
+    ) > "$listing" || true
 
-    log_cycle $loop_count "START" "Beginning work cycle"
-    save_state "running"
+    # Same size and mtime keeps the indexed hash; everything else is rehashed
+    awk -F'\t' -v changed="$changed" '
+        FILENAME == ARGV[1] { seen[$1] = $2 "\t" $3; hash[$1] = $4; next }
+        ($1 in seen) && seen[$1] == $2 "\t" $3 { next }
+        { print $1 > changed }
+    ' "$WORKSPACE_INDEX" "$listing" 2>/dev/null || cut -f1 "$listing" > "$changed"
+    if [ -s "$changed" ]; then
+        (cd "$PROJECT_DIR" && tr '\n' '\0' < "$changed" | xargs -0 $hash_cmd 2>/dev/null) > "$hashes" || true
+    fi
 
-    # Log rotation
-    rotate_logs
+    awk -F'\t' -v OFS='\t' -v hashes="$hashes" -v cksum_fmt="$([ "$hash_cmd" = "cksum" ] && echo 1 || echo 0)" '
+        BEGIN {
+            while ((getline line < hashes) > 0) {
+                if (cksum_fmt) {
+                    split(line, f, " ")
+                    h = f[1] "-" f[2]
+                    sub(/^[^ ]+ [^ ]+ /, "", line)
+                } else {
+                    h = substr(line, 1, index(line, " ") - 1)
+                    sub(/^[^ ]+ [ *]/, "", line)
+                }
+                fresh[line] = h
+            }
+        }
+        FILENAME == ARGV[1] { hash[$1] = $4; next }
+        { print $1, $2, $3, (($1 in fresh) ? fresh[$1] : hash[$1]) }
+    ' "$WORKSPACE_INDEX" "$listing" 2>/dev/null | sort > "$WORKSPACE_INDEX.tmp"
+    mv "$WORKSPACE_INDEX.tmp" "$WORKSPACE_INDEX"
+    rm -f "$listing" "$changed" "$hashes"
+}
 
-    # Backup consensus before cycle
-    backup_consensus
+workspace_manifest() {
+    # Usage: workspace_manifest <state_prefix>
+    # Sets WORKSPACE_MANIFEST: files under docs/ and projects/ added (+),
+    # modified (~) or deleted (-) since <state_prefix>.ok, tagged with the
+    # role (docs/<role>/) or project that owns them. The current index is kept
+    # as <state_prefix>.start until workspace_commit promotes it.
+    local prefix="$1"
+    WORKSPACE_MANIFEST=""
+
+    if ! acquire_lock "$WORKSPACE_LOCK"; then
+        return 0
+    fi
+    touch "$WORKSPACE_INDEX"
+    workspace_index_update
+    cp "$WORKSPACE_INDEX" "$prefix.start"
+    release_lock "$WORKSPACE_LOCK"
+
+    if [ ! -f "$prefix.ok" ]; then
+        if [ -s "$prefix.start" ]; then
+            WORKSPACE_MANIFEST="Indexed $(wc -l < "$prefix.start" | tr -d ' ') files under docs/ and projects/. No earlier successful cycle to compare against."
+        fi
+        return 0
+    fi
+    WORKSPACE_MANIFEST=$(awk -F'\t' -v max="$WORKSPACE_MANIFEST_LINES" '
+        function owner(path,   part) {
+            split(path, part, "/")
+            if (part[1] == "docs" && part[3] != "") return " (" part[2] ")"
+            if (part[1] == "projects" && part[3] != "") return " (project " part[2] ")"
+            return ""
+        }
+        function note(mark, path) {
+            if (++listed <= max) lines = lines mark " " path owner(path) "\n"
+        }
+        FILENAME == ARGV[1] { old[$1] = $4; next }
+        {
+            total++
+            if (!($1 in old)) { added++; note("+", $1) }
+            else if (old[$1] != $4) { modified++; note("~", $1) }
+            delete old[$1]
+        }
+        END {
+            for (path in old) { deleted++; note("-", path) }
+            if (added + modified + deleted == 0) {
+                if (total) printf "No files under docs/ or projects/ changed (%d indexed).\n", total
+                exit
+            }
+            printf "%d added, %d modified, %d deleted (%d files indexed):\n%s", added, modified, deleted, total, lines
+            if (listed > max) printf "... and %d more\n", listed - max
+        }
+    ' "$prefix.ok" "$prefix.start")
+}
+
+workspace_commit() {
+    # Usage: workspace_commit <state_prefix>  — after a successful cycle
+    if [ -f "$1.start" ]; then
+        mv "$1.start" "$1.ok"
+    fi
+}
 
-    # Build prompt with consensus pre-injected
-    PROMPT=$(cat "$PROMPT_FILE")
-    CONSENSUS=$(cat "$CONSENSUS_FILE" 2>/dev/null || echo "No consensus file found. This is the very first cycle.")
-    FULL_PROMPT="$PROMPT
+build_prompt() {
+    # Usage: build_prompt <consensus_file> <snapshot_file> <cycle_num> [lane_brief] [workspace_manifest]
+    # Layout is static-first for prompt-prefix caching: PROMPT.md, lane brief,
+    # live consensus, then the consensus delta since <snapshot_file>, the
+    # workspace manifest, the consensus size budget and the cycle number.
+    local consensus_file="$1"
+    local snapshot_file="$2"
+    local cycle_num="$3"
+    local lane_brief="${4:-}"
+    local manifest="${5:-}"
+    local prompt consensus delta="" budget=""
+
+    prompt=$(cat "$PROMPT_FILE")
+    if [ "$CONSENSUS_MAX_BYTES" -gt 0 ]; then
+        budget="consensus.md is $(wc -c < "$consensus_file" 2>/dev/null | tr -d ' ' || echo 0) of its $CONSENSUS_MAX_BYTES-byte budget. History beyond the newest $CONSENSUS_KEEP_ENTRIES entries is archived automatically; if the rest is still over budget the cycle fails, so keep the other sections short."
+    fi
+    consensus=$(cat "$consensus_file" 2>/dev/null || echo "No consensus file found. This is the very first cycle.")
+    if [ -f "$snapshot_file" ] && [ -f "$consensus_file" ] && ! cmp -s "$snapshot_file" "$consensus_file"; then
+        delta=$(diff "$snapshot_file" "$consensus_file" | grep '^[<>] ' | sed 's/^</-/; s/^>/+/' \
+            | head -n "$CONSENSUS_DELTA_LINES" || true)
+    fi
+    FULL_PROMPT="$prompt
 
 ---
+${lane_brief:+
+$lane_brief
 
+---
+}
 ## Current Consensus (pre-loaded, do NOT re-read this file)
 
-$CONSENSUS
+$consensus
+
+---
+${delta:+
+## Consensus Changes Since Your Last Cycle (by humans or parallel lanes)
+
+$delta
 
 ---
+}${manifest:+
+## Workspace Changes Since Your Last Successful Cycle (docs/ and projects/, paths from the company root)
 
-This is Cycle #$loop_count. Act decisively."
+$manifest
 
-    # Run Claude Code in headless mode with per-cycle timeout
-    run_claude_cycle "$FULL_PROMPT"
+---
+}${budget:+
+$budget
+}
+This is Cycle #$cycle_num. Act decisively."
+}
 
-    # Save full output to cycle log
-    echo "$OUTPUT" > "$cycle_log"
+run_serial_cycle() {
+    CYCLE_LIMIT_HIT=0
+    # A "run now" sent while this cycle runs must not cut the next wait short
+    RUN_NOW=0
+    loop_count=$((loop_count + 1))
+    local cycle_log
+    cycle_log="$LOG_DIR/cycle-$(printf '%04d' $loop_count)-$(date '+%Y%m%d-%H%M%S').log"
 
-    # Extract result fields for status classification
-    extract_cycle_metadata
+    select_cycle_model "$loop_count" "$CONSENSUS_FILE"
+    log_cycle $loop_count "START" "Beginning work cycle ($CYCLE_KIND, model: $CYCLE_MODEL)"
+    save_state "running"
 
-    cycle_failed_reason=""
-    if [ "$CYCLE_TIMED_OUT" -eq 1 ]; then
-        cycle_failed_reason="Timed out after ${CYCLE_TIMEOUT_SECONDS}s"
-    elif [ $EXIT_CODE -ne 0 ]; then
-        cycle_failed_reason="Exit code $EXIT_CODE"
-    elif [ "$CYCLE_SUBTYPE" != "success" ]; then
-        cycle_failed_reason="Non-success subtype '${CYCLE_SUBTYPE:-unknown}'"
-    elif ! validate_consensus; then
-        cycle_failed_reason="consensus.md validation failed after cycle"
-    fi
+    # Log rotation
+    rotate_logs
+
+    # Backup consensus before cycle
+    backup_consensus
+
+    # Build prompt with consensus and the workspace manifest pre-injected
+    workspace_manifest "$WORKSPACE_STATE"
+    build_prompt "$CONSENSUS_FILE" "$CONSENSUS_SNAPSHOT" "$loop_count" "" "$WORKSPACE_MANIFEST"
+
+    # Run Claude Code in headless mode with per-cycle timeout; output goes
+    # straight to the cycle log and result fields are extracted on the way
+    run_claude_cycle "$FULL_PROMPT" "$PROJECT_DIR" "$cycle_log"
+    classify_cycle "$loop_count"
+    record_cycle_metrics "$loop_count"
+    archive_cycle_log "$cycle_log" "$loop_count" "${cycle_failed_reason:+FAIL}" "${cycle_failed_reason:-$RESULT_TEXT}" || true
 
     if [ -z "$cycle_failed_reason" ]; then
         log_cycle $loop_count "OK" "Completed (cost: \$${CYCLE_COST:-unknown}, subtype: ${CYCLE_SUBTYPE:-unknown})"
@@ -320,33 +1248,497 @@ This is Cycle #$loop_count. Act decisively."
             log_cycle $loop_count "SUMMARY" "$(echo "$RESULT_TEXT" | head -c 300)"
         fi
         error_count=0
+        limit_streak_reset
+        snapshot_consensus "$CONSENSUS_SNAPSHOT"
+        workspace_commit "$WORKSPACE_STATE"
+        remember_next_action
     else
         error_count=$((error_count + 1))
         log_cycle $loop_count "FAIL" "$cycle_failed_reason (cost: \$${CYCLE_COST:-unknown}, subtype: ${CYCLE_SUBTYPE:-unknown}, errors: $error_count/$MAX_CONSECUTIVE_ERRORS)"
 
         # Restore consensus on failure
         restore_consensus
+        snapshot_consensus "$CONSENSUS_SNAPSHOT"
 
         # Check for usage limit
-        if check_usage_limit "$OUTPUT"; then
-            log_cycle $loop_count "LIMIT" "API usage limit detected. Waiting ${LIMIT_WAIT_SECONDS}s..."
+        if check_usage_limit "$CYCLE_LIMIT_LINE"; then
+            local limit_wait wait_started
+            limit_wait=$(limit_wait_seconds "$(parse_limit_reset "$CYCLE_LIMIT_LINE")" "$(limit_streak_bump)")
+            log_cycle $loop_count "LIMIT" "API usage limit detected. Waiting ${limit_wait}s..."
             save_state "waiting_limit"
-            sleep $LIMIT_WAIT_SECONDS
+            wait_started=$(date +%s)
+            wait_for_event "$limit_wait" 0 0
+            record_wait_metrics "limit" "$wait_started" "$(date +%s)" "$loop_count"
             error_count=0
-            continue
+            CYCLE_LIMIT_HIT=1
+            return 0
         fi
 
         # Circuit breaker
         if [ $error_count -ge $MAX_CONSECUTIVE_ERRORS ]; then
             log_cycle $loop_count "BREAKER" "Circuit breaker tripped! Cooling down ${COOLDOWN_SECONDS}s..."
             save_state "circuit_break"
-            sleep $COOLDOWN_SECONDS
+            local cooldown_started
+            cooldown_started=$(date +%s)
+            wait_for_event "$COOLDOWN_SECONDS" 1
+            record_wait_metrics "breaker" "$cooldown_started" "$(date +%s)" "$loop_count"
             error_count=0
             log "Circuit breaker reset. Resuming..."
         fi
     fi
+}
+
+# === Parallel Lanes ===
+# With MAX_PARALLEL_CYCLES > 1, each active project in consensus.md gets its
+# own lane: a workspace under projects/, a private copy of consensus.md, its
+# own cycle log, watchdog and error counter. Lane results are merged back
+# into memories/consensus.md section by section under a lock.
+
+acquire_lock() {
+    # mkdir-based lock (flock is not available on macOS)
+    local lock="$1"
+    local waited=0 holder
+    while ! mkdir "$lock" 2>/dev/null; do
+        holder=$(cat "$lock/pid" 2>/dev/null || echo "")
+        if [ -n "$holder" ] && ! kill -0 "$holder" 2>/dev/null; then
+            rm -rf "$lock"
+            continue
+        fi
+        if [ "$waited" -ge 120 ]; then
+            return 1
+        fi
+        sleep 1
+        waited=$((waited + 1))
+    done
+    echo "${BASHPID:-$$}" > "$lock/pid"
+}
+
+release_lock() {
+    rm -rf "$1"
+}
+
+lane_slug() {
+    local slug
+    slug=$(printf '%s' "$1" | LC_ALL=C tr '[:upper:]' '[:lower:]' | LC_ALL=C tr -cs 'a-z0-9' '-' | sed 's/^-*//; s/-*$//')
+    if [ -z "$slug" ]; then
+        slug="lane-$(printf '%s' "$1" | cksum | cut -d' ' -f1)"
+    fi
+    echo "$slug"
+}
+
+list_active_projects() {
+    # One lane slug per bullet under "## Active Projects"
+    if [ ! -f "$CONSENSUS_FILE" ]; then
+        return 0
+    fi
+    awk '
+        /^## / { in_section = ($0 ~ /^## Active Projects/); next }
+        in_section && /^[-*] / {
+            name = $0
+            sub(/^[-*] +/, "", name)
+            sub(/:.*/, "", name)
+            sub(/：.*/, "", name)
+            gsub(/[][`*]/, "", name)
+            gsub(/^ +| +$/, "", name)
+            if (name == "" || tolower(name) ~ /^(none|tbd|n\/a|项目|无|暂无)$/) next
+            print name
+        }
+    ' "$CONSENSUS_FILE" | while IFS= read -r name; do
+        lane_slug "$name"
+    done | awk '!seen[$0]++'
+}
+
+merge_consensus_sections() {
+    # Usage: merge_consensus_sections <current> <base> <lane>  — merged file on stdout
+    # Section-wise 3-way merge. List sections (history, projects, questions)
+    # keep the current entries, drop those the lane deleted and append those it
+    # added. Single-value sections (Last Updated, Next Action, Company State, ...)
+    # take the lane's version when the lane changed them, else keep current.
+    awk '
+        function listy(h) { return h ~ /^## (What We Did This Cycle|Key Decisions Made|Active Projects|Open Questions)/ }
+        function entries(f, h, out,   n, i, k, line) {
+            # Bullets with their indented continuation lines, blank lines dropped
+            n = split(body[f, h], line, "\n")
+            k = 0
+            for (i = 1; i <= n; i++) {
+                if (line[i] ~ /^[ \t]*$/) continue
+                if (line[i] ~ /^[ \t]/ && k) out[k] = out[k] "\n" line[i]
+                else out[++k] = line[i]
+            }
+            return k
+        }
+        function trimmed(text) {
+            sub(/\n+$/, "", text)
+            return text
+        }
+        FNR == 1 { sec = "" }
+        /^## / {
+            sec = $0
+            if (!((f, sec) in has)) {
+                has[f, sec] = 1
+                if (f == 1) order[++n_cur] = sec
+                if (f == 3) lane_order[++n_lane] = sec
+            }
+            next
+        }
+        { body[f, sec] = body[f, sec] $0 "\n" }
+        END {
+            for (i = 1; i <= n_lane; i++) {
+                if (!((1, lane_order[i]) in has)) order[++n_cur] = lane_order[i]
+            }
+            text = trimmed(body[3, ""] != body[2, ""] ? body[3, ""] : body[1, ""])
+            if (text != "") print text "\n"
+            for (i = 1; i <= n_cur; i++) {
+                h = order[i]
+                print h
+                if (listy(h)) {
+                    split("", cur); split("", base); split("", lane); split("", in_base); split("", in_lane); split("", kept)
+                    nc = entries(1, h, cur); nb = entries(2, h, base); nl = entries(3, h, lane)
+                    for (j = 1; j <= nb; j++) in_base[base[j]] = 1
+                    for (j = 1; j <= nl; j++) in_lane[lane[j]] = 1
+                    for (j = 1; j <= nc; j++) {
+                        if ((cur[j] in in_base) && (3, h) in has && !(cur[j] in in_lane)) continue
+                        print cur[j]
+                        kept[cur[j]] = 1
+                    }
+                    for (j = 1; j <= nl; j++) {
+                        if (!(lane[j] in in_base) && !(lane[j] in kept)) {
+                            print lane[j]
+                            kept[lane[j]] = 1
+                        }
+                    }
+                } else {
+                    text = ((3, h) in has && body[3, h] != body[2, h]) ? body[3, h] : body[1, h]
+                    text = trimmed(text)
+                    if (text != "") print text
+                }
+                if (i < n_cur) print ""
+            }
+        }
+    ' f=1 "$1" f=2 "$2" f=3 "$3"
+}
+
+merge_lane_consensus() {
+    local lane_dir="$1"
+    local cycle_num="$2"
+    local merged="$lane_dir/consensus.merged"
+    MERGE_ERROR=""
+
+    if ! acquire_lock "$CONSENSUS_LOCK"; then
+        log "Lane $(basename "$lane_dir"): timed out waiting for consensus lock"
+        MERGE_ERROR="consensus lock timed out"
+        return 1
+    fi
+
+    # Lanes run from the company root, so one can still write the live file
+    # directly. Anything but the loop's own merges since dispatch is undone.
+    if [ -f "$LANE_CONSENSUS_GOOD" ] && ! cmp -s "$LANE_CONSENSUS_GOOD" "$CONSENSUS_FILE"; then
+        cp "$CONSENSUS_FILE" "$lane_dir/consensus.rejected" 2>/dev/null || true
+        cp "$LANE_CONSENSUS_GOOD" "$CONSENSUS_FILE"
+        log "Lane $(basename "$lane_dir"): memories/consensus.md was changed outside the merge; restored (kept as $lane_dir/consensus.rejected)"
+        MERGE_ERROR="memories/consensus.md written directly during the lane"
+        release_lock "$CONSENSUS_LOCK"
+        return 1
+    fi
+
+    if [ -s "$CONSENSUS_FILE" ]; then
+        merge_consensus_sections "$CONSENSUS_FILE" "$lane_dir/consensus.base" "$lane_dir/consensus.md" > "$merged"
+    else
+        cp "$lane_dir/consensus.md" "$merged"
+    fi
+
+    if rollover_consensus "$merged" "$cycle_num" "$CONSENSUS_MAX_BYTES"; then
+        backup_consensus
+        mv "$merged" "$CONSENSUS_FILE"
+        cp "$CONSENSUS_FILE" "$lane_dir/consensus.last"
+        cp "$CONSENSUS_FILE" "$LANE_CONSENSUS_GOOD"
+        release_lock "$CONSENSUS_LOCK"
+        return 0
+    fi
+
+    log "Lane $(basename "$lane_dir"): merged consensus rejected ($CONSENSUS_ERROR)"
+    MERGE_ERROR="merged consensus rejected ($CONSENSUS_ERROR)"
+    rm -f "$merged"
+    release_lock "$CONSENSUS_LOCK"
+    return 1
+}
+
+run_lane() {
+    local slug="$1"
+    local cycle_num="$2"
+    local lane_dir="$LANES_DIR/$slug"
+    local lane_consensus="$LANES_DIR/$slug/consensus.md"
+    local lane_errors next_run cycle_log
+
+    mkdir -p "$lane_dir" "$PROJECT_DIR/projects/$slug"
+    lane_errors=$(cat "$lane_dir/errors" 2>/dev/null || echo 0)
+    cycle_log="$LOG_DIR/cycle-$(printf '%04d' "$cycle_num")-$(date '+%Y%m%d-%H%M%S')-$slug.log"
+
+    # Snapshot consensus as the merge base; the lane edits its own copy
+    if [ -f "$CONSENSUS_FILE" ]; then
+        cp "$CONSENSUS_FILE" "$lane_dir/consensus.base"
+    else
+        : > "$lane_dir/consensus.base"
+    fi
+    cp "$lane_dir/consensus.base" "$lane_consensus"
+
+    select_cycle_model "$cycle_num" "$lane_consensus" "$slug"
+    log_cycle "$cycle_num" "START" "Lane '$slug' beginning work cycle ($CYCLE_KIND, model: $CYCLE_MODEL)"
+
+    workspace_manifest "$lane_dir/workspace"
+    build_prompt "$lane_consensus" "$lane_dir/consensus.last" "$cycle_num" "## Lane: $slug
+
+Several lanes run in parallel this cycle. Work ONLY on the active project '$slug'.
+- Your working directory is the company root, so the paths in these instructions (.claude/, docs/, memories/) work as usual
+- Write code and project files only under projects/$slug/; other lanes own the other projects/ directories
+- Update $lane_consensus instead of memories/consensus.md. It is merged back when this cycle ends." "$WORKSPACE_MANIFEST"
+
+    # Run from the company root so .claude/ (team skill, agents, settings) and
+    # the relative paths in PROMPT.md resolve; the brief confines the lane
+    run_claude_cycle "$FULL_PROMPT" "$PROJECT_DIR" "$cycle_log"
+    classify_cycle "$cycle_num" "$lane_consensus"
+    if [ -z "$cycle_failed_reason" ] && ! merge_lane_consensus "$lane_dir" "$cycle_num"; then
+        cycle_failed_reason="consensus merge failed: $MERGE_ERROR"
+    fi
+    record_cycle_metrics "$cycle_num" "$slug"
+    archive_cycle_log "$cycle_log" "$cycle_num" "${cycle_failed_reason:+FAIL}" "${cycle_failed_reason:-$RESULT_TEXT}" || true
+
+    next_run=$(( $(date +%s) + LOOP_INTERVAL ))
+    if [ -z "$cycle_failed_reason" ]; then
+        log_cycle "$cycle_num" "OK" "Lane '$slug' completed (cost: \$${CYCLE_COST:-unknown}, subtype: ${CYCLE_SUBTYPE:-unknown})"
+        if [ -n "$RESULT_TEXT" ]; then
+            log_cycle "$cycle_num" "SUMMARY" "$(echo "$RESULT_TEXT" | head -c 300)"
+        fi
+        lane_errors=0
+        limit_streak_reset
+        workspace_commit "$lane_dir/workspace"
+    else
+        cp "$lane_dir/consensus.base" "$lane_dir/consensus.last"
+        lane_errors=$((lane_errors + 1))
+        log_cycle "$cycle_num" "FAIL" "Lane '$slug': $cycle_failed_reason (cost: \$${CYCLE_COST:-unknown}, subtype: ${CYCLE_SUBTYPE:-unknown}, errors: $lane_errors/$MAX_CONSECUTIVE_ERRORS)"
+
+        if check_usage_limit "$CYCLE_LIMIT_LINE"; then
+            # Usage limits are account-wide: ask the scheduler to pause everyone
+            log_cycle "$cycle_num" "LIMIT" "Lane '$slug' hit API usage limit. Pausing dispatch..."
+            parse_limit_reset "$CYCLE_LIMIT_LINE" > "$LIMIT_FLAG"
+            lane_errors=0
+        elif [ "$lane_errors" -ge "$MAX_CONSECUTIVE_ERRORS" ]; then
+            log_cycle "$cycle_num" "BREAKER" "Lane '$slug' circuit breaker tripped! Cooling down ${COOLDOWN_SECONDS}s..."
+            next_run=$(( $(date +%s) + COOLDOWN_SECONDS ))
+            record_wait_metrics "breaker" "$(date +%s)" "$next_run" "$cycle_num" "$slug"
+            lane_errors=0
+        fi
+    fi
+
+    echo "$lane_errors" > "$lane_dir/errors"
+    echo "$next_run" > "$lane_dir/next_run"
+}
+
+lane_is_running() {
+    case " $lane_names " in
+        *" $1 "*) return 0 ;;
+    esac
+    return 1
+}
+
+lane_count() {
+    set -- $lane_pids
+    echo $#
+}
+
+reap_lanes() {
+    local pids="" names="" pid
+    set -- $lane_names
+    for pid in $lane_pids; do
+        if kill -0 "$pid" 2>/dev/null; then
+            pids="$pids $pid"
+            names="$names $1"
+        else
+            wait "$pid" 2>/dev/null || true
+        fi
+        shift
+    done
+    lane_pids="${pids# }"
+    lane_names="${names# }"
+}
+
+dispatch_lane() {
+    local slug="$1"
+    loop_count=$((loop_count + 1))
+    rotate_logs
+    # With no lane in flight, the live consensus is the loop's (or a human's)
+    # and becomes what merge_lane_consensus expects to find
+    if [ -z "$lane_pids" ]; then
+        if [ -f "$CONSENSUS_FILE" ]; then
+            cp "$CONSENSUS_FILE" "$LANE_CONSENSUS_GOOD"
+        else
+            rm -f "$LANE_CONSENSUS_GOOD"
+        fi
+    fi
+    run_lane "$slug" "$loop_count" &
+    lane_pids="${lane_pids:+$lane_pids }$!"
+    lane_names="${lane_names:+$lane_names }$slug"
+}
+
+run_parallel_scheduler() {
+    local slug projects next_run limit_wait wait_started budget_held=0
+
+    while true; do
+        if check_stop_requested; then
+            log "Stop requested. Waiting for running lanes (${lane_names:-none}) to finish..."
+            wait
+            lane_pids=""
+            lane_names=""
+            cleanup
+        fi
+
+        reap_lanes
+
+        if [ -f "$LIMIT_FLAG" ]; then
+            # Let in-flight lanes drain, then wait out the limit once
+            if [ -z "$lane_pids" ]; then
+                limit_wait=$(limit_wait_seconds "$(cat "$LIMIT_FLAG")" "$(limit_streak_bump)")
+                log "API usage limit detected by a lane. Waiting ${limit_wait}s..."
+                save_state "waiting_limit"
+                wait_started=$(date +%s)
+                wait_for_event "$limit_wait" 0 0
+                record_wait_metrics "limit" "$wait_started" "$(date +%s)" "$loop_count"
+                rm -f "$LIMIT_FLAG"
+            else
+                wait_for_event 5
+            fi
+            continue
+        fi
+
+        projects=$(list_active_projects)
+        if [ -z "$projects" ]; then
+            # Nothing to fan out yet (e.g. Day 0): fall back to one serial cycle
+            if [ -z "$lane_pids" ]; then
+                run_serial_cycle
+                if [ "$CYCLE_LIMIT_HIT" -eq 0 ]; then
+                    wait_between_cycles
+                fi
+            else
+                wait_for_event 5
+            fi
+            continue
+        fi
+
+        # Budget governor: hold new dispatches while spend runs ahead
+        if [ "$(lane_count)" -lt "$MAX_PARALLEL_CYCLES" ] && budget_check && [ "$BUDGET_WAIT" -gt 0 ]; then
+            if [ "$budget_held" -eq 0 ]; then
+                log_cycle $loop_count "BUDGET" "Spent $BUDGET_SPEND. Holding new lanes for ${BUDGET_WAIT}s..."
+                budget_held=$(date +%s)
+            fi
+            save_state "waiting_budget"
+            wait_for_event 5
+            continue
+        elif [ "$budget_held" -gt 0 ]; then
+            record_wait_metrics "budget" "$budget_held" "$(date +%s)" "$loop_count"
+            budget_held=0
+        fi
+
+        for slug in $projects; do
+            if [ "$(lane_count)" -ge "$MAX_PARALLEL_CYCLES" ]; then
+                break
+            fi
+            if lane_is_running "$slug"; then
+                continue
+            fi
+            next_run=$(cat "$LANES_DIR/$slug/next_run" 2>/dev/null || echo 0)
+            if [ "$(date +%s)" -lt "$next_run" ]; then
+                continue
+            fi
+            dispatch_lane "$slug"
+        done
+
+        save_state "running"
+        wait_for_event 5
+    done
+}
+
+# === Setup ===
+
+mkdir -p "$LOG_DIR" "$LIVE_DIR" "$METRICS_DIR" "$PROJECT_DIR/memories" "$LANES_DIR"
+
+# Clean up stale stop file from previous run
+rm -f "$PROJECT_DIR/.auto-loop-stop"
+
+# Check for existing instance
+if [ -f "$PID_FILE" ]; then
+    existing_pid=$(cat "$PID_FILE")
+    if kill -0 "$existing_pid" 2>/dev/null; then
+        echo "Auto loop already running (PID $existing_pid). Stop it first with ./stop-loop.sh"
+        exit 1
+    fi
+fi
+
+# Only one loop instance runs, so any lane lock or limit flag left is stale
+rm -rf "$CONSENSUS_LOCK" "$ARCHIVE_LOCK" "$LOG_ARCHIVE_LOCK" "$LIMIT_FLAG"
+rm -f "$LIVE_DIR"/*.status
+# Process trees of cycles from a crashed run; only the env marker is trusted
+# since the process group id may have been reused
+for stale_tree in "$LIVE_DIR"/*.pgid; do
+    if [ -f "$stale_tree" ]; then
+        stale_reaped=$(reap_cycle_tree "" 0 "$(cut -d' ' -f3 "$stale_tree")")
+        if [ "$stale_reaped" -gt 0 ]; then
+            log "Reaped $stale_reaped leftover processes from $(basename "$stale_tree" .pgid)"
+        fi
+        rm -f "$stale_tree"
+    fi
+done
+
+# Check dependencies
+if ! command -v claude &>/dev/null; then
+    echo "Error: 'claude' CLI not found in PATH. Install Claude Code first."
+    exit 1
+fi
+
+if [ ! -f "$PROMPT_FILE" ]; then
+    echo "Error: PROMPT.md not found at $PROMPT_FILE"
+    exit 1
+fi
+
+# Write PID file
+echo $$ > "$PID_FILE"
+
+# Trap signals for graceful shutdown
+trap cleanup SIGTERM SIGINT SIGHUP
+# SIGUSR1 = "run now": cut the current wait short
+trap 'RUN_NOW=1' SIGUSR1
+
+# Initialize counters
+loop_count=0
+error_count=0
+lane_pids=""
+lane_names=""
+CYCLE_LIMIT_HIT=0
+RUN_NOW=0
+
+log "=== Auto Company Loop Started (PID $$) ==="
+log "Project: $PROJECT_DIR"
+log "Model: $MODEL_ROUTINE (routine), $MODEL_DECISION (decision) | Budget: \$${BUDGET_HOURLY_USD}/h, \$${BUDGET_DAILY_USD}/day | Interval: ${LOOP_INTERVAL}s | Timeout: ${CYCLE_TIMEOUT_SECONDS}s | Breaker: ${MAX_CONSECUTIVE_ERRORS} errors | Lanes: ${MAX_PARALLEL_CYCLES}"
+
+# Pack any raw cycle logs left over from a crash or an older version
+archive_stray_cycle_logs
+
+# === Main Loop ===
+
+if [ "$MAX_PARALLEL_CYCLES" -gt 1 ]; then
+    run_parallel_scheduler
+fi
+
+while true; do
+    # Check for stop request
+    if check_stop_requested; then
+        log "Stop requested. Shutting down gracefully."
+        cleanup
+    fi
+
+    run_serial_cycle
+    if [ "$CYCLE_LIMIT_HIT" -eq 1 ]; then
+        continue
+    fi
 
-    save_state "idle"
-    log_cycle $loop_count "WAIT" "Sleeping ${LOOP_INTERVAL}s before next cycle..."
-    sleep $LOOP_INTERVAL
+    wait_between_cycles
 done
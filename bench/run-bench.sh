@@ -0,0 +1,267 @@
+#!/bin/bash
+# ============================================================
+# Auto Company — Loop Overhead Benchmarks
+# ============================================================
+# Runs auto-loop.sh against bench/fake-claude in a throwaway sandbox, so
+# nothing here reaches the real CLI or the network. Linux and macOS.
+#
+# Usage:
+#   ./bench/run-bench.sh [all|overhead|watchdog|memory|breaker|rotate|workspace ...]
+#
+# Benchmarks:
+#   overhead   Per-cycle orchestration time (fake exit -> next fake start)
+#   watchdog   When a hung cycle is killed, and how soon the next one starts
+#   memory     Peak RSS of the loop process with multi-MB outputs (json + stream)
+#   breaker    Time from the tripping failure to the next cycle vs COOLDOWN_SECONDS
+#   rotate     Startup and per-cycle cost with thousands of cycle logs on disk
+#   workspace  First (full) and later (incremental) workspace indexing under docs/
+#
+# Knobs (environment):
+#   BENCH_CYCLES=20        # Cycles per overhead run
+#   BENCH_OUTPUT_MB=8      # Result size for the memory benchmark
+#   BENCH_TIMEOUT=2        # CYCLE_TIMEOUT_SECONDS for the watchdog benchmark
+#   BENCH_COOLDOWN=3       # COOLDOWN_SECONDS for the breaker benchmark
+#   BENCH_LOGS=2000        # Cycle logs seeded for the rotate benchmark
+#   BENCH_FILES=5000       # docs/ files seeded for the workspace benchmark
+#   BENCH_KEEP=0           # 1 = keep sandboxes for inspection
+# ============================================================
+
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+REPO_DIR="$(dirname "$SCRIPT_DIR")"
+FAKE_CLAUDE="$SCRIPT_DIR/fake-claude"
+
+BENCH_CYCLES="${BENCH_CYCLES:-20}"
+BENCH_OUTPUT_MB="${BENCH_OUTPUT_MB:-8}"
+BENCH_TIMEOUT="${BENCH_TIMEOUT:-2}"
+BENCH_COOLDOWN="${BENCH_COOLDOWN:-3}"
+BENCH_LOGS="${BENCH_LOGS:-2000}"
+BENCH_FILES="${BENCH_FILES:-5000}"
+BENCH_KEEP="${BENCH_KEEP:-0}"
+BENCH_DEADLINE=600
+
+SANDBOXES=""
+
+# === Helpers ===
+
+now_ms() {
+    local t
+    t=$(date +%s%N)
+    case "$t" in
+        *N) perl -MTime::HiRes=time -e 'printf "%d\n", time * 1000' ;;
+        *) echo $((t / 1000000)) ;;
+    esac
+}
+
+report() {
+    # Usage: report <name> <detail>
+    printf '%-10s %s\n' "$1" "$2"
+}
+
+summarize() {
+    # Reads one number (ms) per line; prints n/mean/p50/p95/max
+    sort -n | awk '
+        { v[NR] = $1; sum += $1 }
+        END {
+            if (NR == 0) { print "no samples"; exit }
+            printf "n=%d mean=%dms p50=%dms p95=%dms max=%dms\n", NR, sum / NR,
+                v[int((NR * 50 + 99) / 100)], v[int((NR * 95 + 99) / 100)], v[NR]
+        }'
+}
+
+cleanup_sandboxes() {
+    local dir
+    if [ "$BENCH_KEEP" -eq 1 ]; then
+        [ -n "$SANDBOXES" ] && echo "Sandboxes kept:$SANDBOXES"
+        return 0
+    fi
+    for dir in $SANDBOXES; do
+        rm -rf "$dir"
+    done
+}
+trap cleanup_sandboxes EXIT
+
+new_sandbox() {
+    # Sets SANDBOX to a fresh project copy whose PATH resolves claude to the fake
+    SANDBOX=$(mktemp -d "${TMPDIR:-/tmp}/auto-loop-bench.XXXXXX")
+    SANDBOXES="$SANDBOXES $SANDBOX"
+    cp "$REPO_DIR/auto-loop.sh" "$REPO_DIR/PROMPT.md" "$SANDBOX/"
+    mkdir -p "$SANDBOX/bin" "$SANDBOX/memories" "$SANDBOX/logs" "$SANDBOX/state"
+    ln -s "$FAKE_CLAUDE" "$SANDBOX/bin/claude"
+    cat > "$SANDBOX/memories/consensus.md" <<'EOF'
+# Auto Company Consensus
+
+## What We Did This Cycle
+- Benchmark sandbox created
+
+## Key Decisions Made
+- None yet
+
+## Active Projects
+- None
+
+## Next Action
+Keep going.
+
+## Company State
+- Product: benchmark
+EOF
+
+    if [ "$(PATH="$SANDBOX/bin:$PATH" command -v claude)" != "$SANDBOX/bin/claude" ]; then
+        echo "Error: fake claude is not first in PATH; refusing to run." >&2
+        exit 1
+    fi
+}
+
+run_loop() {
+    # Usage: run_loop [VAR=value ...]
+    # Runs the sandbox loop until it stops itself (FAKE_CLAUDE_STOP_AFTER).
+    # Sets LOOP_LAUNCHED (ms), LOOP_WALL_MS, PEAK_LOOP_KB and PEAK_TREE_KB.
+    local loop_pid deadline rss tree
+
+    LOOP_LAUNCHED=$(now_ms)
+    (
+        cd "$SANDBOX" && exec env PATH="$SANDBOX/bin:$PATH" \
+            FAKE_CLAUDE_STATE_DIR="$SANDBOX/state" \
+            FAKE_CLAUDE_STOP_FILE="$SANDBOX/.auto-loop-stop" \
+            LOOP_INTERVAL=0 "$@" ./auto-loop.sh
+    ) > "$SANDBOX/loop.out" 2>&1 &
+    loop_pid=$!
+
+    PEAK_LOOP_KB=0
+    PEAK_TREE_KB=0
+    deadline=$(( $(date +%s) + BENCH_DEADLINE ))
+    while kill -0 "$loop_pid" 2>/dev/null; do
+        rss=$(ps -o rss= -p "$loop_pid" 2>/dev/null | tr -d ' ' || true)
+        if [ -n "$rss" ] && [ "$rss" -gt "$PEAK_LOOP_KB" ]; then
+            PEAK_LOOP_KB=$rss
+        fi
+        tree=$(ps -A -o pid= -o ppid= -o rss= | awk -v root="$loop_pid" '
+            { parent[$1] = $2; rss[$1] = $3 }
+            END {
+                for (p in parent) {
+                    for (q = p; q != "" && q != 0 && q != 1; q = parent[q]) {
+                        if (q == root) { total += rss[p]; break }
+                    }
+                }
+                print total + 0
+            }')
+        if [ "$tree" -gt "$PEAK_TREE_KB" ]; then
+            PEAK_TREE_KB=$tree
+        fi
+        if [ "$(date +%s)" -ge "$deadline" ]; then
+            echo "Error: loop did not stop within ${BENCH_DEADLINE}s (see $SANDBOX/loop.out)" >&2
+            kill -TERM "$loop_pid" 2>/dev/null || true
+            BENCH_KEEP=1
+            break
+        fi
+        sleep 0.1
+    done
+    wait "$loop_pid" 2>/dev/null || true
+    LOOP_WALL_MS=$(( $(now_ms) - LOOP_LAUNCHED ))
+}
+
+event_times() {
+    # Usage: event_times <start|end|killed>  — "call ms" rows from events.tsv
+    awk -F'\t' -v kind="$1" '$2 == kind { print $1, $3 }' "$SANDBOX/state/events.tsv"
+}
+
+cycle_gaps() {
+    # ms from each fake exit to the next fake start
+    awk -F'\t' '
+        $2 == "start" { start[$1] = $3 }
+        $2 == "end" { end[$1] = $3 }
+        END { for (i = 1; (i + 1) in start; i++) if (i in end) print start[i + 1] - end[i] }
+    ' "$SANDBOX/state/events.tsv"
+}
+
+# === Benchmarks ===
+
+bench_overhead() {
+    new_sandbox
+    run_loop FAKE_CLAUDE_STOP_AFTER="$BENCH_CYCLES"
+    report "overhead" "$(cycle_gaps | summarize)  (${BENCH_CYCLES} cycles, wall ${LOOP_WALL_MS}ms)"
+}
+
+bench_watchdog() {
+    new_sandbox
+    run_loop FAKE_CLAUDE_SCENARIO=hang FAKE_CLAUDE_STOP_AFTER=3 \
+        CYCLE_TIMEOUT_SECONDS="$BENCH_TIMEOUT" MAX_CONSECUTIVE_ERRORS=100
+    report "watchdog" "kill after $(awk -F'\t' '
+        $2 == "start" { start[$1] = $3 }
+        $2 == "killed" { print $3 - start[$1] }
+    ' "$SANDBOX/state/events.tsv" | summarize)  (timeout $((BENCH_TIMEOUT * 1000))ms)"
+    report "watchdog" "kill to next cycle $(awk -F'\t' '
+        $2 == "start" { start[$1] = $3 }
+        $2 == "killed" { killed[$1] = $3 }
+        END { for (i = 1; (i + 1) in start; i++) if (i in killed) print start[i + 1] - killed[i] }
+    ' "$SANDBOX/state/events.tsv" | summarize)"
+}
+
+bench_memory() {
+    local mode bytes=$((BENCH_OUTPUT_MB * 1048576))
+    for mode in 0 1; do
+        new_sandbox
+        run_loop FAKE_CLAUDE_OUTPUT_BYTES="$bytes" FAKE_CLAUDE_STOP_AFTER=3 STREAM_OUTPUT="$mode"
+        report "memory" "STREAM_OUTPUT=$mode: loop peak ${PEAK_LOOP_KB}KB, process tree peak ${PEAK_TREE_KB}KB  (${BENCH_OUTPUT_MB}MB results)"
+    done
+}
+
+bench_breaker() {
+    new_sandbox
+    run_loop FAKE_CLAUDE_SCENARIO=fail,fail,fail,ok FAKE_CLAUDE_STOP_AFTER=4 \
+        MAX_CONSECUTIVE_ERRORS=3 COOLDOWN_SECONDS="$BENCH_COOLDOWN"
+    local recovery
+    recovery=$(cycle_gaps | sed -n 3p)
+    report "breaker" "recovery ${recovery:-?}ms, $(( ${recovery:-0} - BENCH_COOLDOWN * 1000 ))ms over the ${BENCH_COOLDOWN}s cooldown"
+}
+
+bench_rotate() {
+    local seeded i first_start
+    for seeded in 0 "$BENCH_LOGS"; do
+        new_sandbox
+        i=1
+        while [ "$i" -le "$seeded" ]; do
+            printf '{"type":"result","subtype":"success","result":"seeded log %d","total_cost_usd":0.01}\n' "$i" \
+                > "$SANDBOX/logs/$(printf 'cycle-%04d-20260101-000000.log' "$i")"
+            i=$((i + 1))
+        done
+        run_loop FAKE_CLAUDE_STOP_AFTER=10
+        first_start=$(event_times start | awk 'NR == 1 { print $2 }')
+        report "rotate" "${seeded} logs: startup $(( first_start - LOOP_LAUNCHED ))ms, per cycle $(cycle_gaps | summarize)"
+    done
+}
+
+bench_workspace() {
+    local seeded i first_start
+    for seeded in 0 "$BENCH_FILES"; do
+        new_sandbox
+        i=1
+        while [ "$i" -le "$seeded" ]; do
+            mkdir -p "$SANDBOX/docs/role-$((i % 14))"
+            echo "seeded doc $i" > "$SANDBOX/docs/role-$((i % 14))/doc-$i.md"
+            i=$((i + 1))
+        done
+        run_loop FAKE_CLAUDE_STOP_AFTER=10
+        first_start=$(event_times start | awk 'NR == 1 { print $2 }')
+        report "workspace" "${seeded} files: first index $(( first_start - LOOP_LAUNCHED ))ms, per cycle $(cycle_gaps | summarize)"
+    done
+}
+
+# === Main ===
+
+if [ $# -eq 0 ] || [ "$1" = "all" ]; then
+    set -- overhead watchdog memory breaker rotate workspace
+fi
+
+echo "=== Auto Loop Benchmarks ($(uname -s), bash ${BASH_VERSION}) ==="
+for name in "$@"; do
+    case "$name" in
+        overhead|watchdog|memory|breaker|rotate|workspace) "bench_$name" ;;
+        *)
+            echo "Unknown benchmark: $name (expected all|overhead|watchdog|memory|breaker|rotate|workspace)" >&2
+            exit 1
+            ;;
+    esac
+done
@@ -9,6 +9,11 @@
 #   ./monitor.sh --last     # Show last cycle's full output
 #   ./monitor.sh --status   # Show current loop status
 #   ./monitor.sh --cycles   # Summary of all cycles
+#   ./monitor.sh --cycle N  # Full log of cycle N from the archive
+#   ./monitor.sh --grep PATTERN  # Search archived cycle summaries
+#   ./monitor.sh --live     # Live progress of running cycles (STREAM_OUTPUT=1)
+#   ./monitor.sh --stats [24h|7d|all]  # Latency, success rate, cost, lost time
+#   ./monitor.sh --archive [PATTERN]  # List or search archived consensus
 # ============================================================
 
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
@@ -17,8 +22,30 @@ LOG_DIR="$PROJECT_DIR/logs"
 STATE_FILE="$PROJECT_DIR/.auto-loop-state"
 PID_FILE="$PROJECT_DIR/.auto-loop.pid"
 PAUSE_FLAG="$PROJECT_DIR/.auto-loop-paused"
+ARCHIVE_DIR="$PROJECT_DIR/memories/archive"
+METRICS_FILE="$LOG_DIR/metrics/cycles.jsonl"
+METRICS_INDEX="$LOG_DIR/metrics/index.tsv"
+LOG_ARCHIVE_DIR="$LOG_DIR/archive"
+LOG_MANIFEST="$LOG_ARCHIVE_DIR/manifest.tsv"
 LABEL="com.autocompany.loop"
 
+read_archived() {
+    # Usage: read_archived <pack> <offset> <length>
+    # Seeks straight to one gzip member of a pack; no scan of the archive
+    tail -c +"$(( $2 + 1 ))" "$LOG_ARCHIVE_DIR/$1" | head -c "$3" | gzip -dc
+}
+
+show_result() {
+    # Prints the final result text of a cycle log on stdin, or the raw log
+    local raw
+    raw=$(cat)
+    if command -v jq &>/dev/null && printf '%s\n' "$raw" | jq -r 'select(.type == "result") | .result' 2>/dev/null; then
+        :
+    else
+        printf '%s\n' "$raw"
+    fi
+}
+
 case "${1:-}" in
     --status)
         echo "=== Auto Company Status ==="
@@ -62,19 +89,57 @@ case "${1:-}" in
         ;;
 
     --last)
+        entry=$(tail -n 1 "$LOG_MANIFEST" 2>/dev/null)
         latest=$(ls -t "$LOG_DIR"/cycle-*.log 2>/dev/null | head -1)
-        if [ -n "$latest" ]; then
-            echo "=== Latest Cycle: $(basename "$latest") ==="
-            if command -v jq &>/dev/null && jq -r '.result' "$latest" 2>/dev/null; then
-                :
-            else
-                cat "$latest"
-            fi
+        live="$LOG_DIR/live/$(basename "${latest:-none}" .log)"
+        if [ -n "$latest" ] && [ ! -f "$live.pgid" ]; then
+            # Raw log no cycle is writing: left unarchived by a crash
+            echo "=== Latest Cycle: $(basename "$latest") (unarchived) ==="
+            show_result < "$latest"
+        elif [ -n "$latest" ] && [ -f "$live.status" ]; then
+            # STREAM_OUTPUT=1 writes progress into the log as the cycle runs
+            echo "=== Latest Cycle: $(basename "$latest") (running, last 40 events) ==="
+            tail -n 40 "$latest"
+        elif [ -n "$entry" ]; then
+            # A JSON-mode log stays empty until claude exits: show the last completed cycle
+            IFS=$'\t' read -r cycle ts name pack offset length status summary <<< "$entry"
+            echo "=== Latest Cycle: $name ($status) ==="
+            read_archived "$pack" "$offset" "$length" | show_result
+        elif [ -n "$latest" ]; then
+            echo "Cycle $(basename "$latest") is still running; no completed cycle yet."
         else
             echo "No cycle logs found."
         fi
         ;;
 
+    --cycle)
+        if [ -z "${2:-}" ]; then
+            echo "Usage: ./monitor.sh --cycle N"
+            exit 1
+        fi
+        # Latest entry wins: lanes and restarts can reuse a cycle number
+        entry=$(awk -F'\t' -v n="$2" '$1 == n { e = $0 } END { if (e != "") print e }' "$LOG_MANIFEST" 2>/dev/null)
+        if [ -z "$entry" ]; then
+            echo "Cycle #$2 not found in $LOG_MANIFEST"
+            exit 1
+        fi
+        IFS=$'\t' read -r cycle ts name pack offset length status summary <<< "$entry"
+        echo "=== Cycle #$cycle: $name ($ts, $status) ==="
+        read_archived "$pack" "$offset" "$length"
+        ;;
+
+    --grep)
+        if [ -z "${2:-}" ]; then
+            echo "Usage: ./monitor.sh --grep PATTERN"
+            exit 1
+        fi
+        echo "=== Cycle Logs: '$2' ==="
+        awk -F'\t' -v q="$2" 'index(tolower($8), tolower(q)) || index(tolower($3), tolower(q)) {
+            printf "Cycle #%s  %s  %-4s  %s\n", $1, $2, $7, $8
+            found = 1
+        } END { if (!found) print "No matches." }' "$LOG_MANIFEST" 2>/dev/null || echo "No archive yet."
+        ;;
+
     --cycles)
         echo "=== Cycle History ==="
         if [ -f "$LOG_DIR/auto-loop.log" ]; then
@@ -84,6 +149,106 @@ case "${1:-}" in
         fi
         ;;
 
+    --stats)
+        window="${2:-24h}"
+        case "$window" in
+            all) since=0 ;;
+            *m) since=$(( $(date +%s) - ${window%m} * 60 )) ;;
+            *h) since=$(( $(date +%s) - ${window%h} * 3600 )) ;;
+            *d) since=$(( $(date +%s) - ${window%d} * 86400 )) ;;
+            *) echo "Usage: ./monitor.sh --stats [30m|24h|7d|all]"; exit 1 ;;
+        esac
+        echo "=== Cycle Stats ($window) ==="
+        if [ ! -s "$METRICS_FILE" ]; then
+            echo "No metrics yet."
+            exit 0
+        fi
+
+        # Seek to the first indexed day that can contain records in the window
+        offset=$(awk -F'\t' -v since="$since" '$1 <= since - since % 86400 { o = $2 } END { print o + 0 }' "$METRICS_INDEX" 2>/dev/null)
+        json_fields='
+            function num(k) {
+                if (match($0, "\"" k "\":[-0-9.]+")) return substr($0, RSTART + length(k) + 3, RLENGTH - length(k) - 3) + 0
+                return 0
+            }
+            function str(k) {
+                if (match($0, "\"" k "\":\"[^\"]*\"")) return substr($0, RSTART + length(k) + 4, RLENGTH - length(k) - 5)
+                return ""
+            }
+        '
+        window_records() {
+            tail -c +"$((offset + 1))" "$METRICS_FILE" | awk -v since="$since" "$json_fields"'num("end") >= since'
+        }
+
+        window_records | awk "$json_fields"'
+            str("kind") == "cycle" {
+                cycles++
+                if (str("failure") == "") ok++
+                if ($0 ~ /"timed_out":true/) timeouts++
+                cost += num("cost")
+                cpu += num("cpu_user") + num("cpu_sys")
+                if (num("peak_rss_kb") > peak) peak = num("peak_rss_kb")
+                reaped += num("reaped")
+                if (!first || num("start") < first) first = num("start")
+                if (num("end") > last) last = num("end")
+            }
+            str("kind") == "wait" {
+                lost[str("reason")] += num("duration")
+                waits[str("reason")]++
+            }
+            END {
+                hours = (last - first) / 3600
+                if (hours < 1) hours = 1
+                printf "Cycles:       %d (OK %d, FAIL %d, timeouts %d)\n", cycles, ok, cycles - ok, timeouts
+                printf "Success rate: %.1f%%\n", cycles ? ok * 100 / cycles : 0
+                printf "Cost:         $%.2f total, $%.2f/hour, $%.2f/cycle\n", cost, cost / hours, cycles ? cost / cycles : 0
+                printf "Resources:    %.1fs CPU/cycle, peak RSS %dMB, %d leftover processes reaped\n", cycles ? cpu / cycles : 0, peak / 1024, reaped
+                printf "Lost to limits:   %dm (%d waits)\n", lost["limit"] / 60, waits["limit"]
+                printf "Lost to breaker:  %dm (%d cooldowns)\n", lost["breaker"] / 60, waits["breaker"]
+                printf "Held by budget:   %dm (%d holds)\n", lost["budget"] / 60, waits["budget"]
+            }
+        '
+        window_records | awk "$json_fields"'str("kind") == "cycle" { print num("duration") }' | sort -n | awk '
+            { d[NR] = $1 }
+            END {
+                if (NR > 0) printf "Latency:      p50 %ds, p95 %ds, max %ds\n", d[int((NR * 50 + 99) / 100)], d[int((NR * 95 + 99) / 100)], d[NR]
+            }
+        '
+        ;;
+
+    --live)
+        echo "=== Live Cycles (Ctrl+C to stop) ==="
+        while true; do
+            now=$(date +%s)
+            found=0
+            for status in "$LOG_DIR"/live/*.status; do
+                [ -f "$status" ] || continue
+                found=1
+                IFS=$'\t' read -r started events last < "$status"
+                printf '[%s] %s  running %ss  events: %s  last: %s\n' "$(date '+%H:%M:%S')" \
+                    "$(basename "$status" .status)" "$((now - started))" "$events" "${last:-starting}"
+            done
+            if [ "$found" -eq 0 ]; then
+                echo "[$(date '+%H:%M:%S')] No cycle streaming (start the loop with STREAM_OUTPUT=1)"
+            fi
+            sleep 2
+        done
+        ;;
+
+    --archive)
+        if [ -n "${2:-}" ]; then
+            echo "=== Consensus Archive: '$2' ==="
+            (cd "$ARCHIVE_DIR" 2>/dev/null && grep -H -n -i -- "$2" consensus-*.md) || echo "No matches."
+        else
+            echo "=== Consensus Archive (latest rollovers) ==="
+            if [ -f "$ARCHIVE_DIR/index.tsv" ]; then
+                tail -20 "$ARCHIVE_DIR/index.tsv" | awk -F'\t' '{ printf "Cycle #%s  %s  %s:%s  (%s entries) %s\n", $1, $2, $3, $4, $5, $6 }'
+            else
+                echo "No archive yet."
+            fi
+        fi
+        ;;
+
     *)
         echo "=== Auto Company Live Monitor (Ctrl+C to stop) ==="
         echo "Watching: $LOG_DIR/auto-loop.log"